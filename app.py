@@ -1,107 +1,499 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file
+from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file, g, Response, stream_with_context, stream_template, make_response
+import os
+import time
+import hashlib
+from functools import wraps
 import sqlite3
 import json
-from datetime import datetime
+import csv
+import queue
+import tempfile
+import threading
+from datetime import datetime, timedelta
 import openpyxl
-from io import BytesIO
-from flask_socketio import SocketIO
+from io import StringIO
+from flask_socketio import SocketIO, join_room
+import create_db
+from metrics import KitchenMetrics
+from floor import FloorState, read_table
+from instrumentation import Instrumentation, InstrumentedConnection, add_statements, collect_statements
+from local_queue import SQLiteQueueManager
+from writer import DURABILITY_LEVELS, GroupCommitWriter
+from spooler import TicketSpooler
+from jobs import JobRunner
+from backup import BackupScheduler
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'it3rNullsec!'
-socketio = SocketIO(app)
+# 기본값. KENDO_ 로 시작하는 환경 변수가 있으면 덮어씀 (예: KENDO_PORT=8000)
+app.config.from_mapping(
+    SECRET_KEY='it3rNullsec!',
+    DB_PATH='kendo_bar.db',
+    ARCHIVE_PATH=None,              # 일자 마감한 기록을 모아두는 DB, None 이면 kendo_bar_archive.db
+    HOST='0.0.0.0',
+    PORT=502,
+    DEBUG=False,
+    SOCKETIO_ASYNC_MODE=None,       # eventlet / gevent / threading, None 이면 자동 선택
+    SOCKETIO_MESSAGE_QUEUE=None,    # 여러 워커가 방송을 공유할 큐 (redis://... 또는 sqlite:///파일)
+    HTTP_ETAGS=True,                # 데이터 버전 ETag로 304 응답 (여러 프로세스로 띄울 때는 False)
+    FLOOR_REFRESH=False,            # 메인 / 테이블 화면을 그리기 전에 다른 프로세스가 바꾼 테이블을 DB에서 다시 읽음 (여러 프로세스로 띄울 때는 True)
+    STATIC_MAX_AGE=31536000,        # ?v= 지문이 붙은 정적 파일 캐시 시간 (초)
+    WRITE_GROUP_COMMIT=True,        # 주문 / 취소 / 메모 / 시간 시작을 쓰기 스레드 하나에서 묶어서 커밋
+    WRITE_COMMIT_WINDOW_MS=5,       # 첫 요청 뒤 같은 커밋에 더 모으는 시간
+    PRINTER_DEVICES={},             # 스테이션별 주방 티켓 프린터 (예: {"음료": "/dev/usb/lp1"}), 파일 / FIFO 도 됨. 비어 있으면 출력 안 함
+    PRINT_QUEUE_SIZE=200,           # 프린터마다 밀려 있을 수 있는 티켓 수 (넘치면 버림, 주문 요청은 기다리지 않음)
+    PRINT_RETRIES=3,                # 장치 쓰기 실패 시 재시도 횟수
+    WRITE_DURABILITY='normal',      # 모든 커밋에 적용. full: 커밋마다 fsync / normal: 정전 시 마지막 몇 커밋 유실 가능 / off: 벤치마크용
+    JOB_WORKERS=1,                  # 엑셀 / 보고서를 만드는 백그라운드 스레드 수
+    JOB_CACHE_SIZE=20,              # 만들어 둔 보고서 파일을 보관할 개수 (같은 데이터 버전이면 다시 만들지 않음)
+    BACKUP_DIR='backups',           # DB 스냅샷 폴더 (backup.py)
+    BACKUP_INTERVAL=600,            # 스냅샷 주기 (초), 0 이면 자동 백업 안 함
+    BACKUP_KEEP=36,                 # 남겨 둘 스냅샷 수 (기본: 10분 간격으로 6시간)
+    # 주방 화면에서 한 번에 만드는 양 (스테이션별, 예: 타코야끼는 한 판에 6개)
+    KITCHEN_BATCH_SIZES={
+        "타코야끼": 6,
+        "야끼소바": 4,
+        "우삼겹숙주볶음": 2,
+        "나가사키해물우동": 2,
+        "사이드": 4,
+        "음료": 4,
+    },
+)
+app.config.from_prefixed_env('KENDO')
+
+def socketio_options(config):
+    options = {'async_mode': config['SOCKETIO_ASYNC_MODE'] or None}
+    url = config['SOCKETIO_MESSAGE_QUEUE']
+    if url and url.startswith('sqlite:///'):
+        options['client_manager'] = SQLiteQueueManager(url[len('sqlite:///'):])
+    elif url:
+        options['message_queue'] = url
+    return options
+
+socketio = SocketIO(app, **socketio_options(app.config))
+instrumentation = Instrumentation(app)  # 라우트별 지연 시간 / SQL 기록
+
+DB_PATH = app.config['DB_PATH']
+ARCHIVE_PATH = app.config['ARCHIVE_PATH'] or create_db.archive_path_for(DB_PATH)
+backups = BackupScheduler(DB_PATH, app.config['BACKUP_DIR'], ARCHIVE_PATH,
+                          interval=app.config['BACKUP_INTERVAL'], keep=app.config['BACKUP_KEEP'])
+TAKEOUT_START = 20  # 테이크아웃 번호는 20번부터 (1~18번은 매장 테이블)
+PAYMENTS_PAGE_SIZE = 50  # /payments 한 페이지에 보여줄 결제 건수
+DONE_ORDERS_PAGE_SIZE = 100  # /done_orders 한 페이지에 보여줄 완료 건수
+MAX_ITEM_DELTA = 50  # /table/<n>/items 한 항목에서 한 번에 늘리거나 줄일 수 있는 수량 (주문 행이 이만큼 생김)
+
+# 주방 스테이션 목록 / 화면 순서 (메뉴별 스테이션은 menu_items.category)
+MENU_CATEGORY_MAP = create_db.MENU_CATEGORY_MAP
+
+kitchen_metrics = KitchenMetrics()  # 메뉴 → 스테이션은 메뉴 카탈로그를 읽을 때 채움
+floor_state = FloorState()  # 메인 / 테이블 화면은 DB 대신 여기서 읽음
+spooler = TicketSpooler(app.config['PRINTER_DEVICES'],
+                        max_queue=app.config['PRINT_QUEUE_SIZE'],
+                        retries=app.config['PRINT_RETRIES'])
+job_runner = JobRunner(workers=app.config['JOB_WORKERS'], max_jobs=app.config['JOB_CACHE_SIZE'])
+
+# 화면별 데이터 버전: 쓰기 라우트가 커밋한 다음 올리고, 읽기 라우트는 ETag로 사용
+# floor(메인), payments, done_orders, deleted_orders, station:<카테고리>
+# 프로세스 메모리에만 있으므로 워커가 여러 개면 HTTP_ETAGS=False
+class DataVersions:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self.generation = 0  # 전체 무효화 (메뉴 변경 등)
+        self.boot = format(int(time.time()), 'x')  # 재시작하면 이전 ETag는 모두 무효
+
+    def bump(self, *scopes):
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def bump_all(self):
+        with self._lock:
+            self.generation += 1
+
+    # URL 하나는 항상 같은 scope를 쓰므로 ETag에는 버전 숫자만 넣음 (헤더에 한글이 들어가지 않도록)
+    def etag(self, scope):
+        return f"{self.boot}-{self.generation}-{self._versions.get(scope, 0)}"
+
+data_versions = DataVersions()
+
+# 읽기 라우트용: 클라이언트의 If-None-Match 가 현재 버전이면 DB / 템플릿 없이 304
+# scope는 문자열 또는 라우트 인자를 받아 문자열을 돌려주는 함수
+# refresh 는 304 판단 전에 부르는 함수: 다른 프로세스가 바꾼 상태를 먼저 반영하고,
+# 값을 돌려주면 (DB에서 읽은 버전) 이 프로세스의 버전 번호만으로는 알 수 없는 변경도 ETag에 들어감
+def conditional(scope, refresh=None):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            shared_version = refresh() if refresh else None
+            if not app.config['HTTP_ETAGS']:
+                return view(*args, **kwargs)
+            etag = data_versions.etag(scope(**kwargs) if callable(scope) else scope)
+            if shared_version is not None:
+                etag = f"{etag}-{shared_version}"
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.cache_control.no_cache = True  # 캐시는 하되 매번 ETag로 확인
+            return response
+        return wrapper
+    return decorator
+
+# 정적 파일 지문: url_for('static', ...) 에 ?v=<내용 해시>를 붙여서, 파일이 바뀌면 URL도 바뀜
+_static_fingerprints = {}
+
+def static_fingerprint(filename):
+    path = os.path.join(app.static_folder, filename)
+    mtime = os.path.getmtime(path)
+    cached = _static_fingerprints.get(filename)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = _static_fingerprints[filename] = (mtime, hashlib.md5(f.read()).hexdigest()[:10])
+    return cached[1]
+
+@app.url_defaults
+def add_static_fingerprint(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        try:
+            values['v'] = static_fingerprint(values['filename'])
+        except OSError:
+            pass
+
+# 지문이 붙은 정적 파일은 내용이 바뀌지 않으므로 오래 캐시
+@app.after_request
+def static_cache_headers(response):
+    if request.endpoint == 'static' and 'v' in request.args and response.status_code == 200:
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['STATIC_MAX_AGE']
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
+def dict_factory(cursor, row):
+    return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+
+# SQLite 연결 풀: PRAGMA는 연결을 만들 때 한 번만 설정하고, 요청이 끝나면 풀로 반환
+# size=0, tuned=False 이면 예전처럼 요청마다 새 연결(롤백 저널)을 연다 (벤치마크 비교용)
+class ConnectionPool:
+    def __init__(self, db_path, size=8, tuned=True, synchronous='NORMAL'):
+        self.db_path = db_path
+        self.size = size
+        self.tuned = tuned
+        self.synchronous = synchronous
+        self._idle = queue.LifoQueue()
+
+    # 풀에 넣지 않는 새 연결 (쓰기 스레드처럼 연결 하나를 계속 들고 있는 곳에서 사용)
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False, factory=InstrumentedConnection)
+        conn.execute("PRAGMA foreign_keys = ON")
+        if self.tuned:
+            conn.execute("PRAGMA journal_mode = WAL")     # 쓰기 중에도 읽기 가능
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")  # NORMAL: WAL에서는 체크포인트 때만 fsync
+            conn.execute("PRAGMA busy_timeout = 5000")    # database is locked 대신 대기
+            conn.execute("PRAGMA cache_size = -8000")     # 연결당 8MB 페이지 캐시
+            conn.execute("PRAGMA temp_store = MEMORY")
+        conn.row_factory = dict_factory
+        conn.text_factory = str
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            conn.close()
 
-DB_PATH = "kendo_bar.db"
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+db_pool = ConnectionPool(DB_PATH, synchronous=DURABILITY_LEVELS[app.config['WRITE_DURABILITY']])
+
+# 탭 한 번마다 들어오는 짧은 쓰기를 모아서 한 번에 커밋 (writer.py)
+write_journal = GroupCommitWriter(lambda: db_pool.connect(),
+                                  window=app.config['WRITE_COMMIT_WINDOW_MS'] / 1000,
+                                  durability=app.config['WRITE_DURABILITY'])
+
+# fn(cursor) 를 쓰기 트랜잭션 하나로 실행하고 커밋된 다음 반환값을 돌려줌
+# fn 이 예외를 던지면 그 변경만 되돌리고 예외를 그대로 올림
+def run_write(fn):
+    if app.config['WRITE_GROUP_COMMIT']:
+        # 쓰기 스레드에서 실행한 SQL 도 이 요청의 /admin/stats 기록에 포함
+        statements = []
+
+        def traced(cursor):
+            with collect_statements(statements):
+                return fn(cursor)
+        try:
+            return write_journal.submit(traced)
+        finally:
+            add_statements(statements)
+    conn = get_db_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = fn(conn.cursor())
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
+    return result
 
+# 요청마다 연결 하나를 빌려 쓰고, 요청이 끝나면 teardown에서 자동 반환
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA foreign_keys = ON")
-    conn.execute("PRAGMA encoding = 'UTF-8'")
-
-    def dict_factory(cursor, row):
-        return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+    if 'db' not in g:
+        g.db = db_pool.acquire()
+    return g.db
 
-    conn.row_factory = dict_factory
-    conn.text_factory = str
+# 기간 조회용: 아카이브 DB를 붙여서 payments_history 등 UNION 뷰를 쓸 수 있게 한 연결
+def get_history_connection():
+    conn = get_db_connection()
+    create_db.attach_archive(conn, ARCHIVE_PATH)
     return conn
 
+@app.teardown_appcontext
+def close_db_connection(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+# 첫 요청 때 한 번, 현재 대기 중인 주문 수로 주방 지표의 큐 길이를 맞춤
+@app.before_request
+def seed_kitchen_metrics():
+    if not kitchen_metrics.seeded:
+        cursor = get_db_connection().cursor()
+        cursor.execute("SELECT menu_id, COUNT(*) AS count FROM orders GROUP BY menu_id")
+        names = get_menu_catalog().names
+        kitchen_metrics.seed({names.get(row['menu_id']): row['count'] for row in cursor.fetchall()})
+
+# 첫 요청 때 한 번, 테이블 현황을 메모리로 읽어옴
+@app.before_request
+def load_floor_state():
+    if not floor_state.loaded:
+        floor_state.load(get_db_connection().cursor())
+
+# 다른 워커가 쓴 주문 / 결제를 반영 (FLOOR_REFRESH 일 때만, 한 프로세스면 쓰기 라우트가 이미 반영함)
+# 반영한 뒤의 테이블 version 합계를 돌려줌 (메인 화면 ETag 용)
+def refresh_floor_state():
+    if app.config['FLOOR_REFRESH']:
+        floor_state.refresh(get_db_connection().cursor())
+        return floor_state.version()
+    return None
+
+# 경과 시간 문자열 (HH시 MM분 SS초)
+def format_elapsed(seconds):
+    return f"{seconds // 3600:02}시 {(seconds % 3600) // 60:02}분 {seconds % 60:02}초"
+
+# 메뉴 카탈로그: menu_items 테이블을 한 번만 읽어서 조회용 인덱스로 보관
+class MenuCatalog:
+    def __init__(self, items, version):
+        self.version = version
+        # 매장 / 테이크아웃 메뉴 [{'menu_id', 'name', 'price', 'category'}], 가격이 없는 쪽에는 안 나옴
+        self.menus = [
+            {'menu_id': item['menu_id'], 'name': item['name'], 'price': item['dine_in_price'], 'category': item['category']}
+            for item in items if item['dine_in_price'] is not None
+        ]
+        self.takeout_menus = [
+            {'menu_id': item['menu_id'], 'name': item['name'], 'price': item['takeout_price'], 'category': item['category']}
+            for item in items if item['takeout_price'] is not None
+        ]
+        self.ids = {item['name']: item['menu_id'] for item in items}
+        self.names = {item['menu_id']: item['name'] for item in items}  # 판매 중지된 메뉴 포함 (지난 기록 표시용)
+        self.category_of = {item['name']: item['category'] for item in items}
+        self.prices = {menu['name']: menu['price'] for menu in self.menus}
+        self.takeout_prices = {menu['name']: menu['price'] for menu in self.takeout_menus}
+        self.by_category = {
+            category: [menu for menu in self.menus if menu['category'] == category]
+            for category in MENU_CATEGORY_MAP
+        }
+
+    # payments.detail {"menu_id": 수량} -> {메뉴 이름: 수량}
+    def detail(self, detail_json):
+        detail = json.loads(detail_json) if detail_json else {}
+        return {self.names.get(int(menu_id), menu_id): qty for menu_id, qty in detail.items()}
+
+menu_version = 0  # 메뉴 행이 바뀌면 증가시켜 캐시를 무효화
+_menu_catalog = None
+_menu_catalog_lock = threading.Lock()
+
+def load_menu_catalog(conn, version):
+    cursor = conn.cursor()
+    cursor.execute("SELECT menu_id, name, category, dine_in_price, takeout_price FROM menu_items ORDER BY menu_id")
+    return MenuCatalog(cursor.fetchall(), version)
+
+def get_menu_catalog():
+    global _menu_catalog
+    catalog = _menu_catalog
+    if catalog is None or catalog.version != menu_version:
+        with _menu_catalog_lock:
+            if _menu_catalog is None or _menu_catalog.version != menu_version:
+                _menu_catalog = load_menu_catalog(get_db_connection(), menu_version)
+                kitchen_metrics.set_stations(dict(_menu_catalog.category_of))
+            catalog = _menu_catalog
+    return catalog
+
+def invalidate_menu_catalog():
+    global menu_version
+    with _menu_catalog_lock:
+        menu_version += 1
+
+# 주방 스테이션 화면으로 주문 변경분(추가/삭제) 전송
+# orders: order_id, table_num, menu_name 을 가진 dict 목록
+def push_orders(event, orders):
+    category_of = get_menu_catalog().category_of
+    by_category = {}
+    for order in orders:
+        category = category_of.get(order['menu_name'])
+        if category:
+            by_category.setdefault(category, []).append({
+                'order_id': order['order_id'],
+                'table_num': order['table_num'],
+                'menu_name': order['menu_name'],
+                'time': order.get('time')
+            })
+    data_versions.bump(*(f'station:{category}' for category in by_category))
+    for category, items in by_category.items():
+        socketio.emit(event, {'orders': items}, to=category)
+
+# 새 주문을 스테이션별 티켓으로 묶어서 프린터 큐에 넣음 (커밋한 다음에 호출, 출력은 기다리지 않음)
+def print_tickets(orders, memo=''):
+    if not spooler.enabled or not orders:
+        return
+    category_of = get_menu_catalog().category_of
+    by_station = {}
+    for order in orders:
+        category = category_of.get(order['menu_name'])
+        if category in MENU_CATEGORY_MAP:
+            by_station.setdefault(category, []).append(order)
+    for station, station_orders in by_station.items():
+        counts = {}
+        for order in station_orders:
+            counts[order['menu_name']] = counts.get(order['menu_name'], 0) + 1
+        table_num = station_orders[0]['table_num']
+        spooler.submit({
+            'station': station,
+            'table_num': table_num,
+            'takeout': table_num >= TAKEOUT_START,
+            'time': station_orders[0]['time'],
+            'items': list(counts.items()),
+            'order_ids': [order['order_id'] for order in station_orders],
+            'memo': memo,
+        })
+
+# 스테이션 화면이 자기 카테고리 방에 입장
+@socketio.on('join')
+def join_station(data):
+    category = data.get('category') if isinstance(data, dict) else None
+    if category in MENU_CATEGORY_MAP:
+        join_room(category)
+
 # 메인 페이지
 @app.route('/')
+@conditional('floor', refresh=refresh_floor_state)
 def main():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT table_num, total_price, entrance_time, end_time FROM table_orders")
-    rows = cursor.fetchall()
-
+    now = time.time()
     tables = []
-    for row in rows:
-        table_num = row['table_num']
-        total_price = row['total_price']
-        entrance_time = row['entrance_time']
-
-        if entrance_time and entrance_time != "0":
-            try:
-                entrance_dt = datetime.strptime(entrance_time, '%Y-%m-%d %H:%M:%S')
-                elapsed = datetime.now() - entrance_dt
-                elapsed_time_str = f"{elapsed.seconds // 3600:02}시 {(elapsed.seconds % 3600) // 60:02}분 {elapsed.seconds % 60:02}초"
-            except ValueError:
-                elapsed_time_str = "00시 00분 00초"
-        else:
-            elapsed_time_str = "00시 00분 00초"
-
+    for record in floor_state.tables():
         tables.append({
-            'table_num': table_num,
-            'total_price': total_price,
-            'elapsed_time': elapsed_time_str
+            'table_num': record.table_num,
+            'total_price': record.total_price,
+            'elapsed_time': format_elapsed(record.elapsed_seconds(now)),
+            'entrance_epoch': record.entrance_epoch
         })
 
-    conn.close()
     return render_template('./main.html', tables=tables)
 
 # 테이블 페이지
 @app.route('/table/<int:table_num>')
 def table(table_num):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    SELECT tbl_orders, total_price, entrance_time, memo
-    FROM table_orders WHERE table_num = ?
-    """, (table_num,))
-    row = cursor.fetchone()
-    if not row:
+    refresh_floor_state()
+    record = floor_state.get(table_num)
+    if not record:
         return "Table not found", 404
 
-    tbl_orders = row['tbl_orders']
-    total_price = row['total_price']
-    entrance_time = row['entrance_time']
-    memo = row['memo']
-
-    elapsed_seconds = 0
-    if entrance_time and entrance_time != "0":
-        try:
-            entry_time = datetime.strptime(entrance_time, '%Y-%m-%d %H:%M:%S')
-            now = datetime.now()
-            elapsed = now - entry_time
-            elapsed_seconds = int(elapsed.total_seconds())
-            elapsed_time_str = f"{elapsed_seconds // 3600:02}시간 {(elapsed_seconds % 3600) // 60:02}분 {elapsed_seconds % 60:02}초"
-        except ValueError:
-            elapsed_time_str = "00시간 00분 00초"
-    else:
-        elapsed_time_str = "00시간 00분 00초"
-
-    cursor.execute("SELECT menu_json FROM menu")
-    menu_data = json.loads(cursor.fetchone()['menu_json'])
-
-    conn.close()
+    elapsed_seconds = record.elapsed_seconds(time.time())
     return render_template('./table.html', 
                            table_num=table_num,
-                           total_price=total_price,
-                           elapsed_time=elapsed_time_str,
+                           total_price=record.total_price,
+                           elapsed_time=format_elapsed(elapsed_seconds),
                            elapsed_seconds=elapsed_seconds,
-                           entrance_time=entrance_time if entrance_time and entrance_time != "0" else "",
-                           menus=menu_data['menus'],
-                           orders=json.loads(tbl_orders),
-                           memo=memo)
+                           entrance_epoch=record.entrance_epoch,
+                           menus=get_menu_catalog().menus,
+                           orders=record.items,
+                           memo=record.memo)
+
+# 테이블에 메뉴 count개 추가: 주방 주문을 만들고 table_items 수량을 올림
+# (total_price는 table_items 트리거가 같은 트랜잭션에서 갱신)
+def add_table_items(cursor, table_num, menu_id, price, count, timestamp):
+    new_orders = insert_orders(cursor, [(table_num, menu_id, price, timestamp)] * count)
+    cursor.execute("""
+    INSERT INTO table_items (table_num, menu_id, qty, price)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (table_num, menu_id) DO UPDATE SET qty = qty + excluded.qty
+    """, (table_num, menu_id, count, price))
+    return new_orders
+
+# 테이블에서 메뉴 count개 취소 (쓰기 트랜잭션 안에서 호출)
+# 주방 대기 중인 주문은 order_id로 지정한 것, 없으면 가장 최근 것부터 하나씩 deleted_orders로 옮김
+# 이미 나간 메뉴는 대기열에 없으니 계산서 수량만 줄어듦
+# 반환: (대기열에서 빠진 주문 목록, 실제로 취소된 수량)
+def cancel_table_items(cursor, table_num, menu_id, count, timestamp, order_id=None):
+    cursor.execute("""
+    SELECT qty FROM table_items WHERE table_num = ? AND menu_id = ?
+    """, (table_num, menu_id))
+    row = cursor.fetchone()
+    count = min(count, row['qty'] if row else 0)
+    if count <= 0:
+        return [], 0
+
+    if order_id is not None:
+        cursor.execute("""
+        SELECT order_id, table_num, menu_id, name AS menu_name, time
+        FROM orders CROSS JOIN menu_items USING (menu_id)
+        WHERE order_id = ? AND table_num = ? AND menu_id = ?
+        """, (order_id, table_num, menu_id))
+    else:
+        cursor.execute("""
+        SELECT order_id, table_num, menu_id, name AS menu_name, time
+        FROM orders CROSS JOIN menu_items USING (menu_id)
+        WHERE table_num = ? AND menu_id = ?
+        ORDER BY order_id DESC LIMIT ?
+        """, (table_num, menu_id, count))
+    removed = cursor.fetchall()
+
+    cursor.executemany("""
+    INSERT INTO deleted_orders (table_num, menu_id, order_time, delete_time)
+    VALUES (?, ?, ?, ?)
+    """, [(order['table_num'], order['menu_id'], order['time'], timestamp) for order in removed])
+    cursor.executemany("DELETE FROM orders WHERE order_id = ?", [(order['order_id'],) for order in removed])
+
+    # table_items에서 수량 -count (total_price는 트리거가 갱신)
+    cursor.execute("""
+    UPDATE table_items
+    SET qty = qty - ?
+    WHERE table_num = ? AND menu_id = ?
+    """, (count, table_num, menu_id))
+    return removed, count
+
+# 취소 후 주방 화면 / 지표 갱신 (커밋한 다음에 호출)
+def publish_cancellation(menu_name, removed, count):
+    push_orders('order_removed', removed)
+    if removed:
+        data_versions.bump('deleted_orders')
+    for i in range(count):
+        kitchen_metrics.record_cancellation(menu_name, removed_from_queue=i < len(removed))
 
 # 주문 추가
 @app.route('/order', methods=['POST'])
@@ -113,109 +505,161 @@ def add_order():
         price = data['price']
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-        INSERT INTO orders (table_num, menu_name, price, time)
-        VALUES (?, ?, ?, ?)
-        """, (table_num, menu_name, price, timestamp))
-
-        cursor.execute("SELECT tbl_orders, total_price FROM table_orders WHERE table_num = ?", (table_num,))
-        row = cursor.fetchone()
-        if row:
-            tbl_orders = json.loads(row['tbl_orders'])
-            total_price = row['total_price']
-            tbl_orders[menu_name] = tbl_orders.get(menu_name, 0) + 1
-            total_price += price
+        menu_id = get_menu_catalog().ids.get(menu_name)
+        if menu_id is None:
+            return jsonify({'error': f'Unknown menu: {menu_name}'}), 400
 
-            cursor.execute("""
-            UPDATE table_orders 
-            SET tbl_orders = ?, total_price = ?
-            WHERE table_num = ?
-            """, (json.dumps(tbl_orders), total_price, table_num))
+        def apply(cursor):
+            new_orders = add_table_items(cursor, table_num, menu_id, price, 1, timestamp)
+            return new_orders, read_table(cursor, table_num)
+        new_orders, record = run_write(apply)
 
-        conn.commit()
-        conn.close()
+        floor_state.put(record)
+        data_versions.bump('floor')
+        push_orders('order_added', new_orders)
+        print_tickets(new_orders)
+        kitchen_metrics.record_orders([menu_name])
         return jsonify({'message': 'Order added successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# 주문 취소
+class OrderNotFound(Exception):
+    pass
+
+# 주문 취소: order_id를 주면 그 주문을, 없으면 해당 메뉴의 가장 최근 대기 주문을 하나 취소
 @app.route('/cancel', methods=['POST'])
 def cancel_order():
     try:
         data = request.json
-        #order_id = data.get('order_id')  # 안전하게 가져오기
+        order_id = data.get('order_id')
         table_num = data.get('table_num')
         menu_name = data.get('menu_name')
-        price = data.get('price')
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        if not table_num or not menu_name or not price:
+        menu_id = get_menu_catalog().ids.get(menu_name)
+        if not table_num or menu_id is None:
             return jsonify({'error': 'Invalid input data'}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        def apply(cursor):
+            removed, count = cancel_table_items(cursor, table_num, menu_id, 1, timestamp, order_id)
+            if order_id is not None and not removed:
+                raise OrderNotFound(order_id)  # 수량을 줄인 것까지 되돌림
+            return removed, count, read_table(cursor, table_num)
+        try:
+            removed, count, record = run_write(apply)
+        except OrderNotFound:
+            return jsonify({'error': 'Order not found'}), 404
+
+        floor_state.put(record)
+        data_versions.bump('floor')
+        publish_cancellation(menu_name, removed, count)
+        return jsonify({
+            'message': 'Order canceled successfully' if count else 'Nothing to cancel',
+            'removed_order_ids': [order['order_id'] for order in removed],
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # 취소된 주문을 deleted_orders 테이블에 추가
-        cursor.execute("""
-        INSERT INTO deleted_orders (table_num, menu, order_time, delete_time)
-        SELECT table_num, menu_name, time, ?
-        FROM orders
-        WHERE table_num = ? AND menu_name = ?
-        """, (timestamp, table_num, menu_name))
-
-        # table_orders에서 주문 정보 업데이트
-        cursor.execute("SELECT tbl_orders, total_price FROM table_orders WHERE table_num = ?", (table_num,))
-        row = cursor.fetchone()
-        if row:
-            tbl_orders = json.loads(row['tbl_orders'])
-            total_price = row['total_price']
+# 여러 메뉴 주문 / 취소를 한 트랜잭션으로 처리하고 바뀐 테이블 상태를 반환
+# 요청: {"items": [{"menu_name": "교자", "delta": 2}, {"menu_name": "황도", "delta": -1}]}
+@app.route('/table/<int:table_num>/items', methods=['POST'])
+def update_table_items(table_num):
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list):
+        return jsonify({'error': 'Invalid input data'}), 400
+
+    catalog = get_menu_catalog()
+    prices = catalog.prices
+    deltas = {}
+    for item in items:
+        menu_name = item.get('menu_name') if isinstance(item, dict) else None
+        delta = item.get('delta') if isinstance(item, dict) else None
+        if menu_name not in prices or not isinstance(delta, int) or isinstance(delta, bool) \
+                or not 0 < abs(delta) <= MAX_ITEM_DELTA:
+            return jsonify({'error': f'Invalid item: {item}'}), 400
+        deltas[menu_name] = deltas.get(menu_name, 0) + delta
+        if abs(deltas[menu_name]) > MAX_ITEM_DELTA:  # 같은 메뉴를 여러 항목으로 나눠 보낸 경우
+            return jsonify({'error': f'Too many changes for {menu_name}'}), 400
+
+    if not floor_state.get(table_num):
+        return "Table not found", 404
 
-            if menu_name in tbl_orders and tbl_orders[menu_name] > 0:
-                tbl_orders[menu_name] -= 1
-                total_price -= price
-                cursor.execute("""
-                UPDATE table_orders 
-                SET tbl_orders = ?, total_price = ?
-                WHERE table_num = ?
-                """, (json.dumps(tbl_orders), total_price, table_num))
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        conn.commit()
-        conn.close()
-        return jsonify({'message': 'Order canceled successfully'}), 200
+    def apply(cursor):
+        new_orders = []
+        cancellations = []
+        for menu_name, delta in deltas.items():
+            menu_id = catalog.ids[menu_name]
+            if delta > 0:
+                new_orders.extend(add_table_items(cursor, table_num, menu_id, prices[menu_name], delta, timestamp))
+            elif delta < 0:
+                removed, count = cancel_table_items(cursor, table_num, menu_id, -delta, timestamp)
+                cancellations.append((menu_name, removed, count))
+        return new_orders, cancellations, read_table(cursor, table_num)
+
+    try:
+        new_orders, cancellations, record = run_write(apply)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    floor_state.put(record)
+    data_versions.bump('floor')
+    push_orders('order_added', new_orders)
+    print_tickets(new_orders)
+    kitchen_metrics.record_orders([order['menu_name'] for order in new_orders])
+    for menu_name, removed, count in cancellations:
+        publish_cancellation(menu_name, removed, count)
+    return jsonify(record.to_dict()), 200
+
+# 주문 행 여러 개를 executemany 한 번으로 저장하고, 새로 생긴 주문 목록을 반환
+# rows: (table_num, menu_id, price, time) 목록, 쓰기 트랜잭션 안에서 호출
+def insert_orders(cursor, rows):
+    if not rows:
+        return []
+    cursor.execute("SELECT IFNULL(MAX(order_id), 0) AS last_id FROM orders")
+    last_id = cursor.fetchone()['last_id']
+    cursor.executemany("""
+    INSERT INTO orders (table_num, menu_id, price, time)
+    VALUES (?, ?, ?, ?)
+    """, rows)
+    cursor.execute("""
+    SELECT order_id, table_num, name AS menu_name, time
+    FROM orders CROSS JOIN menu_items USING (menu_id)
+    WHERE order_id > ? ORDER BY order_id
+    """, (last_id,))
+    return cursor.fetchall()
+
+# 다음에 발급될 테이크아웃 번호
+def peek_takeout_number(cursor):
+    cursor.execute("SELECT value FROM sequences WHERE name = 'takeout'")
+    row = cursor.fetchone()
+    return row['value'] if row else TAKEOUT_START
+
+# 테이크아웃 번호 발급 (BEGIN IMMEDIATE 트랜잭션 안에서 호출)
+def allocate_takeout_number(cursor):
+    cursor.execute("""
+    INSERT INTO sequences (name, value) VALUES ('takeout', ? + 1)
+    ON CONFLICT (name) DO UPDATE SET value = value + 1
+    RETURNING value - 1 AS number
+    """, (TAKEOUT_START,))
+    return cursor.fetchone()['number']
+
 # 테이크아웃 페이지
 @app.route('/takeout')
 def takeout():
-    conn = get_db_connection()
-    c = conn.cursor()
-
-    # menu_to 테이블에서 데이터 가져오기
-    c.execute('SELECT menu_json FROM menu_to')
-    result = c.fetchone()
-    if not result:
-        conn.close()
+    catalog = get_menu_catalog()
+    if not catalog.takeout_menus:
         return "메뉴 데이터가 없습니다.", 404
 
-    menu_data = json.loads(result['menu_json'])
-
-    # payments 테이블에서 가장 큰 테이블 번호 가져오기
-    c.execute("SELECT MAX(table_num) as max_num FROM payments WHERE table_num >= 20")
-    result = c.fetchone()
-    max_table_num = result['max_num'] if result and result['max_num'] is not None else None
+    conn = get_db_connection()
+    c = conn.cursor()
 
-    # 테이크아웃 번호 설정
-    if max_table_num is None or max_table_num < 20:
-        takeout_number = 20  # 기본값 설정
-    else:
-        takeout_number = max_table_num + 1
+    # 다음 테이크아웃 번호 (발급하지 않고 확인만)
+    takeout_number = peek_takeout_number(c)
 
-    conn.close()
-    return render_template('takeout.html', menus=menu_data['menus'], takeout_number=takeout_number)
+    return render_template('takeout.html', menus=catalog.takeout_menus, takeout_number=takeout_number)
 
 @app.route('/submit-takeout-orders', methods=['POST'])
 def submit_takeout_orders():
@@ -223,34 +667,29 @@ def submit_takeout_orders():
         data = request.json  # 클라이언트에서 전송된 주문 데이터
         orders = data.get('orders', {})  # 주문 데이터
         memo = data.get('memo', '')  # 메모 데이터
+        menu_ids = get_menu_catalog().ids
+        unknown = [menu_name for menu_name in orders if menu_name not in menu_ids]
+        if unknown:
+            return jsonify({'error': f"Unknown menu: {', '.join(unknown)}"}), 400
         conn = get_db_connection()
         c = conn.cursor()
 
-        # 다음 테이크아웃 번호 가져오기
-        c.execute("SELECT MAX(table_num) as max_num FROM payments WHERE table_num >= 20")
-        result = c.fetchone()
-        max_table_num = result['max_num'] if result and result['max_num'] is not None else None
-
-        # 테이크아웃 번호 설정
-        if max_table_num is None or max_table_num < 20:
-            takeout_number = 20  # 기본값 설정
-        else:
-            takeout_number = max_table_num + 1
-        print(f"takeout_number: {takeout_number}")
+        # 테이크아웃 번호 발급 (쓰기 잠금을 먼저 잡아서 동시에 주문해도 번호가 겹치지 않음)
+        conn.execute("BEGIN IMMEDIATE")
+        takeout_number = allocate_takeout_number(c)
 
-        # 주문 데이터 저장
+        # 주문 데이터 저장 (행 목록을 한 번 만들고 executemany 한 번으로 저장)
         total_price = 0
         order_details = {}
+        order_rows = []
+        order_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         for menu_name, data in orders.items():
             count = data['count']
             price = data['price']
             total_price += count * price
-            order_details[menu_name] = count
-            for _ in range(count):
-                c.execute('''
-                    INSERT INTO orders (table_num, menu_name, price, time, etc)
-                    VALUES (?, ?, ?, datetime('now', 'localtime'), 0)
-                ''', (takeout_number, menu_name, price))
+            order_details[menu_ids[menu_name]] = count
+            order_rows.extend([(takeout_number, menu_ids[menu_name], price, order_time)] * count)
+        added_orders = insert_orders(c, order_rows)
 
         # payments 테이블에 정보 저장
         payment_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -260,7 +699,10 @@ def submit_takeout_orders():
         ''', (takeout_number, total_price, payment_time, memo, json.dumps(order_details, ensure_ascii=False), '0', '0', '0', 0))
 
         conn.commit()
-        conn.close()
+        data_versions.bump('payments')
+        push_orders('order_added', added_orders)
+        print_tickets(added_orders, memo)
+        kitchen_metrics.record_orders([order['menu_name'] for order in added_orders])
         return jsonify({'message': '주문이 완료되었습니다.'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -272,60 +714,42 @@ def complete_order(table_num):
         now = datetime.now()
         timestamp = now.strftime('%Y-%m-%d %H:%M:%S')
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT tbl_orders, total_price, entrance_time, memo FROM table_orders WHERE table_num = ?", (table_num,))
-        row = cursor.fetchone()
-
-        if row:
-            tbl_orders = row['tbl_orders']
-            total_price = row['total_price']
-            entrance_time = row['entrance_time']
-            memo = row['memo'] if row['memo'] else "" # 메모 가져오기
-
-            if entrance_time and entrance_time != "0":
-                entrance_dt = datetime.strptime(entrance_time, '%Y-%m-%d %H:%M:%S')
-                used_time = now - entrance_dt
-                used_seconds = int(used_time.total_seconds())
-                used_time_str = f"{used_seconds // 3600:02}시 {(used_seconds % 3600) // 60:02}분 {used_seconds % 60:02}초"
-
+        # 읽기 → 결제 기록 → 비우기를 쓰기 트랜잭션 하나로 (그 사이에 들어온 주문이 결제 없이 지워지지 않도록)
+        def apply(cursor):
+            cursor.execute("SELECT total_price, entrance_time, memo FROM table_orders WHERE table_num = ?", (table_num,))
+            row = cursor.fetchone()
+
+            if row:
+                cursor.execute("SELECT menu_id, qty FROM table_items WHERE table_num = ? AND qty > 0", (table_num,))
+                tbl_orders = json.dumps({item['menu_id']: item['qty'] for item in cursor.fetchall()})
+                total_price = row['total_price']
+                entrance_time = row['entrance_time']
+                memo = row['memo'] if row['memo'] else "" # 메모 가져오기
+
+                if entrance_time and entrance_time != "0":
+                    entrance_dt = datetime.strptime(entrance_time, '%Y-%m-%d %H:%M:%S')
+                    used_time = now - entrance_dt
+                    used_seconds = int(used_time.total_seconds())
+                    used_time_str = f"{used_seconds // 3600:02}시 {(used_seconds % 3600) // 60:02}분 {used_seconds % 60:02}초"
+
+                    cursor.execute("""
+                    INSERT INTO payments 
+                    (table_num, total_price, payment_time, memo, detail, entrance_time, end_time, used_time, used_seconds)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (table_num, total_price, timestamp, memo, tbl_orders, entrance_time, timestamp, used_time_str, used_seconds))
+
+                cursor.execute("DELETE FROM table_items WHERE table_num = ?", (table_num,))
                 cursor.execute("""
-                INSERT INTO payments 
-                (table_num, total_price, payment_time, memo, detail, entrance_time, end_time, used_time, used_seconds)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (table_num, total_price, timestamp, memo, tbl_orders, entrance_time, timestamp, used_time_str, used_seconds))
-
-            reset_orders = {
-                "타코야끼 (데리야끼)": 0,
-                "타코야끼 (불닭)": 0,
-                "야끼소바 (간장)": 0,
-                "야끼소바 (불닭)": 0,
-                "우삼겹숙주볶음": 0,
-                "나가사키해물우동": 0,
-                "흑당인절미 당고": 0,
-                "황도": 0,
-                "교자": 0,
-                "메론소다": 0,
-                "청포도 에이드": 0,
-                "망고 에이드": 0,
-                "아망추": 0,
-                "선라이즈": 0,
-                "로이 로저스": 0,
-                "신데렐라": 0,
-                "하이볼 키트": 0,
-                "입장료 + 자릿세": 0,
-                "콜키지 1L 미만": 0,
-                "콜키지 1L 이상": 0
-            }
-            cursor.execute("""
-            UPDATE table_orders 
-            SET tbl_orders = ?, total_price = 0, entrance_time = '', end_time = '', memo = ''
-            WHERE table_num = ?
-            """, (json.dumps(reset_orders, ensure_ascii=False), table_num))
+                UPDATE table_orders 
+                SET total_price = 0, entrance_time = '', end_time = '', memo = ''
+                WHERE table_num = ?
+                """, (table_num,))
 
-        conn.commit()
-        conn.close()
+            return read_table(cursor, table_num)
+
+        record = run_write(apply)
+        floor_state.put(record)
+        data_versions.bump('floor', 'payments')
         return jsonify({'success': True, 'message': 'Payment completed successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -334,21 +758,27 @@ def complete_order(table_num):
 @app.route('/start-timer/<int:table_num>', methods=['POST'])
 def start_timer(table_num):
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
-    cursor.execute("SELECT entrance_time FROM table_orders WHERE table_num = ?", (table_num,))
-    row = cursor.fetchone()
-    if row and (not row['entrance_time'] or row['entrance_time'] == "0"):
-        cursor.execute("""
-        UPDATE table_orders 
-        SET entrance_time = ?
-        WHERE table_num = ?
-        """, (timestamp, table_num))
-        conn.commit()
+    # 이미 시작한 테이블이면 아무것도 안 함 (None)
+    def apply(cursor):
+        cursor.execute("SELECT entrance_time FROM table_orders WHERE table_num = ?", (table_num,))
+        row = cursor.fetchone()
+        if row and (not row['entrance_time'] or row['entrance_time'] == "0"):
+            cursor.execute("""
+            UPDATE table_orders 
+            SET entrance_time = ?
+            WHERE table_num = ?
+            """, (timestamp, table_num))
+            return read_table(cursor, table_num)
+        return None
+
+    record = run_write(apply)
+    if record:
+        floor_state.put(record)
+        data_versions.bump('floor')
 
-    conn.close()
-    return jsonify({'success': True, 'timestamp': timestamp})
+    record = floor_state.get(table_num)
+    return jsonify({'success': True, 'timestamp': timestamp, 'epoch': record.entrance_epoch if record else None})
 
 @app.route('/save-memo/<int:table_num>', methods=['POST'])
 def save_memo(table_num):
@@ -356,23 +786,31 @@ def save_memo(table_num):
         data = request.json
         memo = data.get('memo', '')  # 클라이언트에서 전달된 메모
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
         # table_orders 테이블에 메모 저장
-        cursor.execute("""
-        UPDATE table_orders
-        SET memo = ?
-        WHERE table_num = ?
-        """, (memo, table_num))
+        def apply(cursor):
+            cursor.execute("""
+            UPDATE table_orders
+            SET memo = ?
+            WHERE table_num = ?
+            """, (memo, table_num))
+            return read_table(cursor, table_num)
 
-        conn.commit()
-        conn.close()
+        record = run_write(apply)
+        floor_state.put(record)
+        data_versions.bump('floor')
 
         return jsonify({'message': 'Memo saved successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# 메뉴 테이블을 직접 수정한 뒤 캐시 다시 읽기
+@app.route('/menu/reload', methods=['POST'])
+def reload_menu():
+    invalidate_menu_catalog()
+    data_versions.bump_all()
+    catalog = get_menu_catalog()
+    return jsonify({'message': 'Menu reloaded', 'version': catalog.version, 'menus': len(catalog.menus)}), 200
+
 @app.route('/order-menu-list')
 def order_menu_list():
     # 고정된 대표 메뉴 목록 (화면에 표시할 메뉴들)
@@ -387,82 +825,85 @@ def order_menu_list():
     return render_template('order_menu_list.html', menus=menus)
 
 @app.route('/menu-orders/<category>')
+@conditional(lambda category: f'station:{category}')
 def view_menu_orders(category):
-    # 카테고리별 메뉴 이름 매핑
-    menu_category_map = {
-        "타코야끼": ["타코야끼 (데리야끼)", "타코야끼 (불닭)"],
-        "야끼소바": ["야끼소바 (간장)", "야끼소바 (불닭)"],
-        "우삼겹숙주볶음": ["우삼겹숙주볶음"],
-        "나가사키해물우동": ["나가사키해물우동"],
-        "사이드": ["흑당인절미 당고", "황도", "교자"],
-        "음료": [
-            "메론소다", "청포도 에이드", "망고 에이드", "아망추",
-            "선라이즈", "로이 로저스", "신데렐라",
-            "하이볼 키트"
-        ]
-    }
-
-    if category not in menu_category_map:
+    if category not in MENU_CATEGORY_MAP:
         return f"존재하지 않는 카테고리입니다: {category}", 404
 
-    menu_names = menu_category_map[category]
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # 메뉴 데이터 가져오기
-    cursor.execute("SELECT menu_json FROM menu")
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
+    catalog = get_menu_catalog()
+    if not catalog.menus:
         return "메뉴 데이터가 없습니다.", 404
 
-    menu_data = json.loads(row['menu_json'])
-    menus = [menu.copy() for menu in menu_data['menus'] if menu['name'] in menu_names]
+    menus = [menu.copy() for menu in catalog.by_category[category]]
+    menu_ids = [menu['menu_id'] for menu in menus]
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
 
     # 해당 메뉴들에 대한 주문 가져오기
-    placeholders = ','.join(['?'] * len(menu_names))
+    placeholders = ','.join(['?'] * len(menu_ids))
     orders = cursor.execute(
-        f"SELECT order_id, table_num, menu_name FROM orders WHERE menu_name IN ({placeholders})",
-        menu_names
+        f"SELECT order_id, table_num, menu_id, time FROM orders WHERE menu_id IN ({placeholders})",
+        menu_ids
     ).fetchall()
-
-    # 메뉴별로 여러 개의 주문 저장
-    for menu in menus:
-        menu['orders'] = [
-            {'order_id': order['order_id'], 'table_num': order['table_num']}
-            for order in orders if order['menu_name'] == menu['name']
-        ]
-
-    conn.close()
-    return render_template('menu_orders.html', category=category, menus=menus)
+    orders.sort(key=lambda order: order['order_id'])  # 먼저 들어온 주문부터
+
+    # 메뉴별 대기 주문 (화면에서 batch_size 개씩 묶어서 표시)
+    orders_by_menu = {menu['name']: [] for menu in menus}
+    for order in orders:
+        orders_by_menu[catalog.names[order['menu_id']]].append(
+            {'order_id': order['order_id'], 'table_num': order['table_num'], 'time': order['time']}
+        )
+
+    return render_template('menu_orders.html',
+                           category=category,
+                           menus=menus,
+                           orders_by_menu=orders_by_menu,
+                           batch_size=app.config['KITCHEN_BATCH_SIZES'].get(category, 1))
+
+# 주문 시각부터 now 까지 걸린 시간 (초)
+def order_latency_seconds(order_time, now):
+    try:
+        return max(0.0, (now - datetime.strptime(order_time, '%Y-%m-%d %H:%M:%S')).total_seconds())
+    except (TypeError, ValueError):
+        return 0.0
+
+# 주문들을 orders에서 done_orders로 옮김 (쓰기 트랜잭션 안에서 호출)
+# 이미 다른 화면에서 완료된 주문은 건너뛰고, 실제로 옮긴 주문 목록을 반환
+def complete_orders(cursor, order_ids, done_time):
+    placeholders = ','.join(['?'] * len(order_ids))
+    cursor.execute(
+        f"SELECT order_id, table_num, menu_id, name AS menu_name, time FROM orders CROSS JOIN menu_items USING (menu_id) WHERE order_id IN ({placeholders})",
+        order_ids
+    )
+    done = cursor.fetchall()
+    cursor.executemany("""
+    INSERT INTO done_orders (table_num, menu_id, order_time, done_time)
+    VALUES (?, ?, ?, ?)
+    """, [(order['table_num'], order['menu_id'], order['time'], done_time) for order in done])
+    cursor.executemany("DELETE FROM orders WHERE order_id = ?", [(order['order_id'],) for order in done])
+    return done
+
+# 완료 후 주방 화면 / 지표 갱신 (커밋한 다음에 호출)
+def publish_completion(done, now):
+    push_orders('order_removed', done)
+    for order in done:
+        kitchen_metrics.record_completion(order['menu_name'], order_latency_seconds(order['time'], now))
 
 @app.route('/complete-order', methods=['POST'])
 def complete_order_one():
     order_id = request.form['order_id']
-    menu_name = request.form['menu_name']
-    table_num = request.form['table_num']
     category = request.form.get('category')  # POST 요청에서 category 값 가져오기
-    done_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # 완료 시간 기록
+    now = datetime.now()
+    done_time = now.strftime('%Y-%m-%d %H:%M:%S')  # 완료 시간 기록
 
     conn = get_db_connection()
     cursor = conn.cursor()
-
-    # 완료된 주문을 done_orders 테이블에 추가
-    cursor.execute("""
-    INSERT INTO done_orders (table_num, menu, order_time, done_time)
-    SELECT table_num, menu_name, time, ?
-    FROM orders
-    WHERE order_id = ?
-    """, (done_time, order_id))
-
-    # orders 테이블에서 해당 주문 삭제
-    cursor.execute("""
-    DELETE FROM orders
-    WHERE order_id = ?
-    """, (order_id,))
-
+    conn.execute("BEGIN IMMEDIATE")
+    done = complete_orders(cursor, [order_id], done_time)
     conn.commit()
-    conn.close()
+    data_versions.bump('done_orders')
+    publish_completion(done, now)
 
     # category 값이 없으면 기본값 설정
     if not category:
@@ -470,94 +911,571 @@ def complete_order_one():
 
     return redirect(url_for('view_menu_orders', category=category))
 
-@app.route('/done_orders')
-def view_done_orders():
+# 한 판(배치) 완료: 화면에 묶여 있던 주문 여러 개를 한 트랜잭션으로 완료
+# 요청: {"order_ids": [12, 13, 15]}
+@app.route('/complete-batch', methods=['POST'])
+def complete_batch():
+    data = request.get_json(silent=True) or {}
+    order_ids = data.get('order_ids')
+    if not isinstance(order_ids, list) or not order_ids or not all(isinstance(order_id, int) for order_id in order_ids):
+        return jsonify({'error': 'Invalid input data'}), 400
+
+    now = datetime.now()
+    done_time = now.strftime('%Y-%m-%d %H:%M:%S')
+
     conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT table_num, menu, order_time, done_time FROM done_orders ORDER BY done_time DESC")
-    done_orders = cur.fetchall()
-    
+    cursor = conn.cursor()
+    conn.execute("BEGIN IMMEDIATE")
+    done = complete_orders(cursor, order_ids, done_time)
     conn.commit()
-    conn.close()
+    data_versions.bump('done_orders')
+    publish_completion(done, now)
+
+    return jsonify({'completed': [order['order_id'] for order in done]}), 200
+
+# 주방 처리량 지표 (Prometheus 텍스트 형식)
+@app.route('/metrics')
+def metrics():
+    text = kitchen_metrics.prometheus_text()
+    if spooler.enabled:
+        text += spooler.prometheus_text()
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+# 주방 처리량 대시보드
+@app.route('/metrics/dashboard')
+def metrics_dashboard():
+    return render_template('metrics.html', metrics=kitchen_metrics.snapshot(), printers=spooler.snapshot())
+
+# 라우트별 지연 시간 / SQL / 프로파일 결과
+@app.route('/admin/stats')
+def admin_stats():
+    return render_template('admin_stats.html', stats=instrumentation.snapshot(), endpoints=sorted(app.view_functions))
+
+# 특정 엔드포인트의 다음 요청들을 프로파일링 (count 번, every 번째 요청마다)
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    endpoint = request.form.get('endpoint', '')
+    if not endpoint:
+        instrumentation.disable_profiling()
+    elif endpoint not in app.view_functions:
+        return f"존재하지 않는 엔드포인트입니다: {endpoint}", 404
+    else:
+        try:
+            instrumentation.enable_profiling(endpoint,
+                                             count=request.form.get('count', 1, type=int),
+                                             every=request.form.get('every', 1, type=int),
+                                             mode=request.form.get('mode', 'cprofile'))
+        except ValueError as e:
+            return str(e), 400
+    return redirect(url_for('admin_stats'))
+
+@app.route('/admin/stats/reset', methods=['POST'])
+def admin_stats_reset():
+    instrumentation.reset()
+    return redirect(url_for('admin_stats'))
+
+# 일자 마감: ?before=YYYY-MM-DD (기본 오늘) 이전의 결제 / 완료 / 취소 기록을 아카이브 DB로 옮김
+@app.route('/admin/rollover', methods=['POST'])
+def admin_rollover():
+    before = request.values.get('before') or None
+    if before:
+        try:
+            datetime.strptime(before, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': '날짜 형식은 YYYY-MM-DD 입니다'}), 400
+    moved = create_db.rollover_database(DB_PATH, before, ARCHIVE_PATH)
+    data_versions.bump('payments', 'done_orders', 'deleted_orders')
+    return jsonify({'moved': moved, 'archive': ARCHIVE_PATH}), 200
+
+# 백업 상태 / 스냅샷 목록
+@app.route('/admin/backups')
+def admin_backups():
+    return jsonify(backups.snapshot())
+
+# 지금 스냅샷 하나 찍기 (백업 스레드가 복사 / 검사하고 요청은 바로 반환)
+@app.route('/admin/backup', methods=['POST'])
+def admin_backup():
+    backups.trigger()
+    return jsonify(backups.snapshot()), 202
+
+# 기간 경계: YYYY-MM-DD(하루 단위) 또는 YYYY-MM-DDTHH:MM(분 단위, datetime-local 입력)
+# upper 이면 그 날 / 그 분의 끝(다음 날 / 다음 분)을 반환
+def parse_range_bound(value, upper):
+    for fmt, output, step in (('%Y-%m-%d', '%Y-%m-%d', timedelta(days=1)),
+                              ('%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M:%S', timedelta(minutes=1))):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return (parsed + step if upper else parsed).strftime(output)
+    raise ValueError(value)
+
+# ?from=...&to=... -> (시작, 끝) 문자열, 기간이 없으면 None
+# 잘못된 날짜는 ValueError
+def parse_date_range(args):
+    date_from = args.get('from') or None
+    date_to = args.get('to') or None
+    if not date_from and not date_to:
+        return None
+    start = parse_range_bound(date_from, upper=False) if date_from else ''
+    end = parse_range_bound(date_to, upper=True) if date_to else '9999'
+    return start, end
+
+# 목록 필터 ?table=3&menu=교자 -> 쿼리의 (? IS NULL OR ...) 자리에 들어갈 인자 (메뉴는 menu_id 문자열)
+def list_filters(args):
+    table_num = args.get('table', type=int)
+    menu = args.get('menu') or None
+    menu_id = str(get_menu_catalog().ids.get(menu, -1)) if menu else None
+    return (table_num, table_num, menu_id, menu_id)
+
+# 페이지 링크에 그대로 넘길 필터 인자
+def filter_query_args(args):
+    return {key: args[key] for key in ('table', 'menu', 'from', 'to') if args.get(key)}
+
+@app.route('/done_orders')
+@conditional('done_orders')
+def view_done_orders():
+    before = request.args.get('before', type=int)  # 이 done_id 보다 이전 완료부터 표시
+    show_all = request.args.get('all') == '1'
+    try:
+        date_range = parse_date_range(request.args)
+    except ValueError:
+        return "날짜 형식은 YYYY-MM-DD 또는 YYYY-MM-DDTHH:MM 입니다", 400
+    filters = list_filters(request.args)
+    last_id = before if before is not None else 2 ** 63 - 1
+    limit = -1 if show_all else DONE_ORDERS_PAGE_SIZE + 1
+
+    # done_id 기준 keyset 페이지네이션 (기간을 지정하면 아카이브까지 합쳐서 조회)
+    # +done_time: 시각 인덱스 대신 done_id 순서로 읽어서 아카이브 쪽도 정렬 없이 LIMIT 에서 멈춤
+    if date_range:
+        cur = get_history_connection().cursor()
+        cur.execute("""
+        SELECT done_id, table_num, menu_id, order_time, done_time
+        FROM done_orders_history
+        WHERE (? IS NULL OR table_num = ?) AND (? IS NULL OR menu_id = ?)
+          AND +done_time >= ? AND +done_time < ? AND done_id < ?
+        ORDER BY done_id DESC
+        LIMIT ?
+        """, (*filters, *date_range, last_id, limit))
+    else:
+        cur = get_db_connection().cursor()
+        cur.execute("""
+        SELECT done_id, table_num, menu_id, order_time, done_time
+        FROM done_orders
+        WHERE (? IS NULL OR table_num = ?) AND (? IS NULL OR menu_id = ?) AND done_id < ?
+        ORDER BY done_id DESC
+        LIMIT ?
+        """, (*filters, last_id, limit))
+
+    catalog = get_menu_catalog()
+    context = {
+        'filter_args': filter_query_args(request.args),
+        'menus': [menu['name'] for menu in catalog.menus],
+        'is_first_page': before is None,
+    }
+    if show_all:
+        # 전체 보기: 커서에서 한 줄씩 읽으면서 바로 그려서 전송 (목록을 메모리에 만들지 않음)
+        done_orders = (format_done_order(row, catalog) for row in cur)
+        return Response(stream_template('done_orders.html', done_orders=done_orders, next_before=None, **context))
 
-    return render_template('done_orders.html', done_orders=done_orders)
+    rows = cur.fetchall()
+    has_more = len(rows) > DONE_ORDERS_PAGE_SIZE
+    rows = rows[:DONE_ORDERS_PAGE_SIZE]
+    return render_template('done_orders.html',
+                           done_orders=[format_done_order(row, catalog) for row in rows],
+                           next_before=rows[-1]['done_id'] if has_more else None,
+                           **context)
+
+# 완료 목록 화면용 행 (menu_id -> 메뉴 이름)
+def format_done_order(row, catalog):
+    row['menu'] = catalog.names.get(row['menu_id'], '')
+    return row
+
+# 기간 조회 때 매출 요약 (sales_summary 등과 같은 모양으로)
+def summarize_payments(rows, catalog):
+    summary = {}
+    hourly = {}
+    menu_qty = {}
+    for row in rows:
+        scope = 'takeout' if row['table_num'] >= TAKEOUT_START else 'dine_in'
+        for key in ('total', scope):
+            entry = summary.setdefault(key, {'scope': key, 'revenue': 0, 'payments': 0})
+            entry['revenue'] += row['total_price']
+            entry['payments'] += 1
+        hour = hourly.setdefault(row['payment_time'][:13], {'hour': row['payment_time'][:13], 'revenue': 0, 'payments': 0})
+        hour['revenue'] += row['total_price']
+        hour['payments'] += 1
+        for menu_name, qty in catalog.detail(row['detail']).items():
+            if qty > 0:
+                menu_qty[menu_name] = menu_qty.get(menu_name, 0) + qty
+    menu_sales = [{'menu_name': name, 'qty': qty} for name, qty in sorted(menu_qty.items(), key=lambda item: -item[1])]
+    return summary, menu_sales, [hourly[key] for key in sorted(hourly)]
+
+# 결제 목록 화면용 행
+def format_payment(row, catalog):
+    return {
+        'payment_id': row['payment_id'],
+        'table_num': row['table_num'],
+        'total_price': row['total_price'],
+        'payment_time': row['payment_time'],
+        'memo': row['memo'],
+        'detail': catalog.detail(row['detail']),
+        'used_time': row['used_time']
+    }
 
 @app.route('/payments')
+@conditional('payments')
 def view_payments():
-    db = get_db_connection()
-    cur = db.cursor()
-    
-    # payments 테이블에서 데이터 가져오기
-    cur.execute("SELECT * FROM payments")
+    before = request.args.get('before', type=int)  # 이 payment_id 보다 이전 결제부터 표시
+    show_all = request.args.get('all') == '1'
+    try:
+        date_range = parse_date_range(request.args)
+    except ValueError:
+        return "날짜 형식은 YYYY-MM-DD 또는 YYYY-MM-DDTHH:MM 입니다", 400
+    filters = list_filters(request.args)
+    last_id = before if before is not None else 2 ** 63 - 1
+    limit = -1 if show_all else PAYMENTS_PAGE_SIZE + 1
+    catalog = get_menu_catalog()
+
+    if date_range:
+        # 기간을 지정하면 아카이브까지 합쳐서 조회
+        cur = get_history_connection().cursor()
+        cur.execute("""
+        SELECT table_num, total_price, payment_time, detail
+        FROM payments_history
+        WHERE payment_time >= ? AND payment_time < ?
+        """, date_range)
+        summary, menu_sales, hourly_sales = summarize_payments(cur.fetchall(), catalog)
+        # +payment_time: payment_id 순서로 읽어서 정렬 없이 LIMIT 에서 멈춤
+        cur.execute("""
+        SELECT payment_id, table_num, total_price, payment_time, memo, detail, used_time
+        FROM payments_history
+        WHERE (? IS NULL OR table_num = ?)
+          AND (? IS NULL OR EXISTS (SELECT 1 FROM json_each(detail) WHERE key = ? AND value > 0))
+          AND +payment_time >= ? AND +payment_time < ? AND payment_id < ?
+        ORDER BY payment_id DESC
+        LIMIT ?
+        """, (*filters, *date_range, last_id, limit))
+    else:
+        cur = get_db_connection().cursor()
+
+        # 매출 요약 (payments 추가 시 트리거로 누적된 값이라 결제 건수와 무관하게 바로 읽음)
+        cur.execute("SELECT scope, revenue, payments FROM sales_summary")
+        summary = {row['scope']: row for row in cur.fetchall()}
+        cur.execute("SELECT menu_id, qty FROM sales_by_menu WHERE qty > 0 ORDER BY qty DESC")
+        menu_sales = [{'menu_name': catalog.names.get(row['menu_id'], ''), 'qty': row['qty']} for row in cur.fetchall()]
+        cur.execute("SELECT hour, revenue, payments FROM sales_by_hour ORDER BY hour")
+        hourly_sales = cur.fetchall()
+
+        # payments 테이블에서 한 페이지만 가져오기 (payment_id 기준 keyset 페이지네이션)
+        cur.execute("""
+        SELECT payment_id, table_num, total_price, payment_time, memo, detail, used_time
+        FROM payments
+        WHERE (? IS NULL OR table_num = ?)
+          AND (? IS NULL OR EXISTS (SELECT 1 FROM json_each(detail) WHERE key = ? AND value > 0))
+          AND payment_id < ?
+        ORDER BY payment_id DESC
+        LIMIT ?
+        """, (*filters, last_id, limit))
+
+    total = summary.get('total')
+    context = {
+        'total_revenue': total['revenue'] if total else 0,
+        'summary': summary,
+        'menu_sales': menu_sales,
+        'hourly_sales': hourly_sales,
+        'is_first_page': before is None,
+        'filter_args': filter_query_args(request.args),
+        'menus': [menu['name'] for menu in catalog.menus],
+    }
+    if show_all:
+        # 전체 보기: 커서에서 한 줄씩 읽으면서 바로 그려서 전송
+        payments = (format_payment(row, catalog) for row in cur)
+        return Response(stream_template('payments.html', payments=payments, next_before=None, **context))
+
     rows = cur.fetchall()
+    has_more = len(rows) > PAYMENTS_PAGE_SIZE
+    rows = rows[:PAYMENTS_PAGE_SIZE]
+    return render_template('payments.html',
+                           payments=[format_payment(row, catalog) for row in rows],
+                           next_before=rows[-1]['payment_id'] if has_more else None,
+                           **context)
+
+# 내보내기 시트별 행 변환
+def format_payment_row(row, catalog):
+    menu_prices = catalog.takeout_prices if row['table_num'] >= TAKEOUT_START else catalog.prices
+    detail = catalog.detail(row['detail'])
+    detail_str = ", ".join([
+        f"{menu_name}({count}개 * {menu_prices.get(menu_name, 0)} = ₩{count * menu_prices.get(menu_name, 0)})"
+        for menu_name, count in detail.items() if count > 0
+    ])
+    return [
+        row['table_num'],
+        row['total_price'],
+        row['entrance_time'],
+        row['payment_time'],
+        row['used_time'],
+        row['memo'],
+        detail_str
+    ]
 
-    payments = []
-    total_revenue = 0  # 총 결제 금액
+def format_done_order_row(row, catalog):
+    return [row['table_num'], catalog.names.get(row['menu_id'], ''), row['order_time'], row['done_time']]
+
+def format_deleted_order_row(row, catalog):
+    return [row['table_num'], catalog.names.get(row['menu_id'], ''), row['order_time'], row['delete_time']]
+
+# 내보내기 시트: 이름 → (엑셀 시트 제목, 헤더, 쿼리, 기간 조회 쿼리(아카이브 포함), 행 변환 함수)
+EXPORT_SHEETS = {
+    'payments': (
+        "Payments",
+        ["테이블 번호", "총 결제 금액", "입장 시간", "결제 시각", "사용 시간", "메모", "상세 주문"],
+        "SELECT table_num, total_price, entrance_time, payment_time, used_time, memo, detail FROM payments ORDER BY payment_id",
+        "SELECT table_num, total_price, entrance_time, payment_time, used_time, memo, detail FROM payments_history WHERE payment_time >= ? AND payment_time < ? ORDER BY payment_time",
+        format_payment_row
+    ),
+    'done_orders': (
+        "Done Orders",
+        ["테이블 번호", "메뉴", "주문 시각", "완료 시각"],
+        "SELECT table_num, menu_id, order_time, done_time FROM done_orders ORDER BY done_id",
+        "SELECT table_num, menu_id, order_time, done_time FROM done_orders_history WHERE done_time >= ? AND done_time < ? ORDER BY done_time",
+        format_done_order_row
+    ),
+    'deleted_orders': (
+        "Deleted Orders",
+        ["테이블 번호", "메뉴", "주문 시각", "취소 시각"],
+        "SELECT table_num, menu_id, order_time, delete_time FROM deleted_orders ORDER BY delete_id",
+        "SELECT table_num, menu_id, order_time, delete_time FROM deleted_orders_history WHERE delete_time >= ? AND delete_time < ? ORDER BY delete_time",
+        format_deleted_order_row
+    ),
+}
+
+# 헤더와 행을 커서에서 한 줄씩 꺼내서 반환 (fetchall 하지 않음)
+def iter_export_rows(cursor, sheet, catalog, date_range=None):
+    title, headers, query, range_query, format_row = EXPORT_SHEETS[sheet]
+    yield headers
+    rows = cursor.execute(range_query, date_range) if date_range else cursor.execute(query)
     for row in rows:
-        payments.append({
-            'table_num': row['table_num'],
-            'total_price': row['total_price'],
-            'payment_time': row['payment_time'],
-            'memo': row['memo'],
-            'detail': json.loads(row['detail']) if row['detail'] else {},
-            'used_time': row['used_time']
-        })
-        total_revenue += row['total_price']
-
-    db.commit()
-    db.close()
-
-    return render_template('payments.html', payments=payments, total_revenue=total_revenue)
+        yield format_row(row, catalog)
 
 @app.route('/export-payments')
 def export_payments():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # payments 테이블에서 데이터 가져오기
-    cursor.execute("SELECT * FROM payments")
-    rows = cursor.fetchall()
-
-    # 메뉴 가격 정보를 가져오기
-    cursor.execute("SELECT menu_json FROM menu")
-    menu_data = json.loads(cursor.fetchone()['menu_json'])
-    menu_prices = {menu['name']: menu['price'] for menu in menu_data['menus']}
-
-    # 엑셀 파일 생성
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Payments"
-
-    # 헤더 추가
-    headers = ["테이블 번호", "총 결제 금액", "입장 시간", "결제 시각", "사용 시간", "메모", "상세 주문"]
-    ws.append(headers)
-
-    # 데이터 추가
-    for row in rows:
-        detail = json.loads(row['detail'])
-        detail_str = ", ".join([
-            f"{menu_name}({count}개 * {menu_prices.get(menu_name, 0)} = ₩{count * menu_prices.get(menu_name, 0)})"
-            for menu_name, count in detail.items() if count > 0
-        ])
-        ws.append([
-            row['table_num'],
-            row['total_price'],
-            row['entrance_time'], 
-            row['payment_time'],
-            row['used_time'],
-            row['memo'],
-            detail_str
-        ])
-
-    # 엑셀 파일을 메모리에 저장
-    output = BytesIO()
+    export_format = request.args.get('format', 'xlsx')
+    catalog = get_menu_catalog()
+    try:
+        date_range = parse_date_range(request.args)
+    except ValueError:
+        return "날짜 형식은 YYYY-MM-DD 또는 YYYY-MM-DDTHH:MM 입니다", 400
+    cursor = (get_history_connection() if date_range else get_db_connection()).cursor()
+
+    if export_format == 'csv':
+        sheet = request.args.get('sheet', 'payments')
+        if sheet not in EXPORT_SHEETS:
+            return f"존재하지 않는 시트입니다: {sheet}", 404
+
+        # 500줄씩 끊어서 바로 전송
+        def generate():
+            buffer = StringIO()
+            writer = csv.writer(buffer)
+            yield '\ufeff'  # 엑셀에서 한글이 깨지지 않도록 BOM
+            for count, row in enumerate(iter_export_rows(cursor, sheet, catalog, date_range), 1):
+                writer.writerow(row)
+                if count % 500 == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+
+        return Response(stream_with_context(generate()),
+                        mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename={sheet}.csv'})
+
+    # write-only 워크북: 행을 메모리에 쌓지 않고 임시 파일로 바로 기록
+    wb = openpyxl.Workbook(write_only=True)
+    for sheet, (title, *_) in EXPORT_SHEETS.items():
+        ws = wb.create_sheet(title)
+        for row in iter_export_rows(cursor, sheet, catalog, date_range):
+            ws.append(row)
+
+    output = tempfile.TemporaryFile()
     wb.save(output)
     output.seek(0)
 
-    conn.close()
-
-    # 엑셀 파일 다운로드
+    # 엑셀 파일 다운로드 (임시 파일을 조각 단위로 전송하고 전송이 끝나면 닫힘)
     return send_file(output, as_attachment=True, download_name="payments.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
+# 보고서 (백그라운드 작업)
+# 매출 분석 보고서는 결제 기록을 한 줄씩 읽어서 파이썬에서 집계 (GROUP BY 로 큰 테이블을 정렬하지 않음)
+def iter_report_payments(cursor, date_range=None):
+    if date_range:
+        return cursor.execute("""
+        SELECT table_num, total_price, payment_time, detail, used_seconds
+        FROM payments_history
+        WHERE payment_time >= ? AND payment_time < ?
+        ORDER BY payment_time
+        """, date_range)
+    return cursor.execute("SELECT table_num, total_price, payment_time, detail, used_seconds FROM payments ORDER BY payment_id")
+
+def export_sheet(cursor, sheet, catalog, date_range=None):
+    return EXPORT_SHEETS[sheet][0], iter_export_rows(cursor, sheet, catalog, date_range)
+
+# 시간대별 매출
+def hourly_sales_sheet(cursor, sheet, catalog, date_range=None):
+    hours = {}
+    for row in iter_report_payments(cursor, date_range):
+        hour = hours.setdefault(row['payment_time'][:13], [0, 0, 0, 0, 0])
+        hour[0] += 1
+        hour[1] += row['total_price']
+        hour[2 if row['table_num'] < TAKEOUT_START else 3] += row['total_price']
+        hour[4] += sum(qty for qty in json.loads(row['detail'] or '{}').values() if qty > 0)
+    rows = [["시간", "결제 건수", "매출", "매장 매출", "테이크아웃 매출", "판매 수량"]]
+    rows += [[f"{hour}시", *hours[hour]] for hour in sorted(hours)]
+    return "Hourly Sales", rows
+
+# 메뉴별 판매 구성 (매출은 현재 메뉴 가격 기준)
+def menu_mix_sheet(cursor, sheet, catalog, date_range=None):
+    qty = {}  # menu_id → [매장 수량, 테이크아웃 수량]
+    for row in iter_report_payments(cursor, date_range):
+        scope = 0 if row['table_num'] < TAKEOUT_START else 1
+        for menu_id, count in json.loads(row['detail'] or '{}').items():
+            if count > 0:
+                qty.setdefault(int(menu_id), [0, 0])[scope] += count
+    lines = []
+    for menu in catalog.menus:
+        dine_in, takeout = qty.get(menu['menu_id'], (0, 0))
+        revenue = dine_in * catalog.prices.get(menu['name'], 0) + takeout * catalog.takeout_prices.get(menu['name'], 0)
+        lines.append([menu['name'], menu['category'], dine_in, takeout, dine_in + takeout, revenue])
+    total_revenue = sum(line[-1] for line in lines)
+    rows = [["메뉴", "스테이션", "매장 수량", "테이크아웃 수량", "전체 수량", "매출", "매출 비중(%)"]]
+    rows += [
+        [*line, round(line[-1] * 100 / total_revenue, 1) if total_revenue else 0]
+        for line in sorted(lines, key=lambda line: -line[-1])
+    ]
+    return "Menu Mix", rows
+
+# 매장 테이블별 회전 (used_seconds 는 시간 시작부터 결제까지)
+def table_turnover_sheet(cursor, sheet, catalog, date_range=None):
+    tables = {}  # table_num → [회전 수, 매출, 시간을 잰 회전 수, 사용 시간 합]
+    for row in iter_report_payments(cursor, date_range):
+        if row['table_num'] >= TAKEOUT_START:
+            continue
+        table = tables.setdefault(row['table_num'], [0, 0, 0, 0])
+        table[0] += 1
+        table[1] += row['total_price']
+        if row['used_seconds']:
+            table[2] += 1
+            table[3] += row['used_seconds']
+    rows = [["테이블 번호", "회전 수", "매출", "회전당 매출", "평균 사용 시간(분)", "착석 시간당 매출"]]
+    for table_num in sorted(tables):
+        turns, revenue, timed, seconds = tables[table_num]
+        rows.append([
+            table_num,
+            turns,
+            revenue,
+            revenue // turns,
+            round(seconds / timed / 60, 1) if timed else None,
+            round(revenue * 3600 / seconds) if seconds else None,
+        ])
+    return "Table Turnover", rows
+
+# 보고서: 이름 → (시트 이름들, 내용이 바뀌는 데이터 버전 scope, 시트 함수(cursor, 시트, catalog, 기간) → (제목, 행))
+# 새 보고서는 여기에 추가하면 /jobs/export 로 만들 수 있음
+REPORTS = {
+    'export': (tuple(EXPORT_SHEETS), ('payments', 'done_orders', 'deleted_orders'), export_sheet),
+    'hourly_sales': (('hourly_sales',), ('payments',), hourly_sales_sheet),
+    'menu_mix': (('menu_mix',), ('payments',), menu_mix_sheet),
+    'table_turnover': (('table_turnover',), ('payments',), table_turnover_sheet),
+}
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# 작업 스레드에서 실행: 풀에서 연결을 따로 빌려 path 에 파일을 씀 (csv 는 시트 하나)
+# 작업 스레드(serve.py 에서는 OS 스레드)에서 실행되므로 요청용 풀 대신 전용 연결을 씀
+def build_report(path, report, export_format, sheets, catalog, date_range):
+    conn = db_pool.connect()
+    try:
+        if date_range:
+            create_db.attach_archive(conn, ARCHIVE_PATH)
+        cursor = conn.cursor()
+        sheet_function = REPORTS[report][2]
+        if export_format == 'csv':
+            with open(path, 'w', encoding='utf-8-sig', newline='') as f:  # 엑셀에서 한글이 깨지지 않도록 BOM
+                writer = csv.writer(f)
+                writer.writerows(sheet_function(cursor, sheets[0], catalog, date_range)[1])
+            return
+        wb = openpyxl.Workbook(write_only=True)
+        for sheet in sheets:
+            title, rows = sheet_function(cursor, sheet, catalog, date_range)
+            ws = wb.create_sheet(title)
+            for row in rows:
+                ws.append(row)
+        wb.save(path)
+    finally:
+        conn.close()
+
+def job_response(job, cached):
+    body = job.to_dict()
+    body['cached'] = cached
+    body['status_url'] = url_for('job_status', job_id=job.id)
+    body['download_url'] = url_for('job_download', job_id=job.id)
+    return body
+
+# 보고서 만들기 요청: report, format(xlsx/csv), sheet(csv 일 때), from, to
+# 같은 조건 + 같은 데이터 버전이면 이미 만든 작업을 돌려줌 (200), 새로 만들면 202
+@app.route('/jobs/export', methods=['POST'])
+def submit_export_job():
+    values = request.get_json(silent=True) or request.values
+    report = values.get('report') or 'export'
+    export_format = values.get('format') or 'xlsx'
+    if report not in REPORTS:
+        return jsonify({'error': f"존재하지 않는 보고서입니다: {report}"}), 404
+    if export_format not in ('xlsx', 'csv'):
+        return jsonify({'error': f"지원하지 않는 형식입니다: {export_format}"}), 400
+    try:
+        date_range = parse_date_range(values)
+    except ValueError:
+        return jsonify({'error': '날짜 형식은 YYYY-MM-DD 또는 YYYY-MM-DDTHH:MM 입니다'}), 400
+    sheet_names, scopes, _ = REPORTS[report]
+    if export_format == 'csv':
+        sheet = values.get('sheet') or sheet_names[0]
+        if sheet not in sheet_names:
+            return jsonify({'error': f"존재하지 않는 시트입니다: {sheet}"}), 404
+        sheets = (sheet,)
+        filename, mimetype = f"{sheet}.csv", 'text/csv'
+    else:
+        sheets = sheet_names
+        filename, mimetype = f"{'payments' if report == 'export' else report}.xlsx", XLSX_MIMETYPE
+
+    catalog = get_menu_catalog()
+    key = (report, export_format, sheets, date_range, catalog.version, tuple(data_versions.etag(scope) for scope in scopes))
+    job, cached = job_runner.submit(
+        key, report, filename, mimetype,
+        lambda path: build_report(path, report, export_format, sheets, catalog, date_range))
+    return jsonify(job_response(job, cached)), 200 if cached and job.status == 'done' else 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다'}), 404
+    return jsonify(job_response(job, False))
+
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    job = job_runner.get(job_id)
+    if job is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다'}), 404
+    if job.status != 'done':
+        return jsonify(job_response(job, False)), 409
+    return send_file(job.path, as_attachment=True, download_name=job.filename, mimetype=job.mimetype)
+
+def startup():
+    create_db.migrate_database(DB_PATH)  # 기존 DB 스키마를 최신으로
+    with app.app_context():
+        get_menu_catalog()  # 시작할 때 메뉴 캐시 적재
+    backups.start()  # BACKUP_INTERVAL 마다 스냅샷
+
+# 개발용 디버그 서버. 운영은 serve.py
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=502, debug=True)
+    startup()
+    app.run(host=app.config['HOST'], port=app.config['PORT'], debug=True)
@@ -0,0 +1,286 @@
+# DB 백업 (스냅샷)
+#
+#   python backup.py snapshot              지금 스냅샷 하나 만들기
+#   python backup.py list                  스냅샷 목록
+#   python backup.py verify <이름>         integrity_check 다시 실행
+#   python backup.py restore <이름|latest> 스냅샷으로 되돌리기 (앱을 멈추고 실행)
+#
+# 파일을 그대로 복사하면 쓰는 중에 찢어진 사본이 생길 수 있으므로 SQLite 온라인 백업 API 로
+# 몇 페이지씩 나눠 복사하고, 단계 사이에 잠깐 쉬어서 주문 쓰기가 밀리지 않게 한다.
+# 스냅샷은 <백업 폴더>/<YYYYmmdd-HHMMSS>/ 아래에 kendo_bar.db (+ 아카이브 DB) 로 저장되고,
+# integrity_check 를 통과해야 .partial 이름을 떼고 목록에 올라간다.
+# serve.py(eventlet / gevent) 에서는 스냅샷을 OS 스레드에서 찍는다 (jobs.run_native, 복사 중에도 요청이 멈추지 않게).
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+import create_db
+from jobs import run_native
+
+SNAPSHOT_FORMAT = '%Y%m%d-%H%M%S'
+
+class BackupRestarted(Exception):
+    pass
+
+# integrity_check 결과가 ok 가 아니면 그 메시지 목록, 정상이면 빈 목록
+def integrity_errors(path):
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return [] if rows == [('ok',)] else [row[0] for row in rows]
+
+# source 를 dest 로 복사. pages 페이지씩 복사하고 단계마다 pause 초 쉼
+# 복사 도중 다른 연결이 쓰면 SQLite 가 처음부터 다시 복사하므로 WAL 이면 읽기 트랜잭션을 잡아 한 시점에 고정
+# (WAL 에서는 읽기 트랜잭션이 쓰기를 막지 않음). 롤백 저널 DB 는 읽기 잠금이 쓰기를 막으므로 잡지 않고,
+# max_restarts 번 넘게 다시 시작되면 한 번에 복사
+def copy_database(source, dest, pages=64, pause=0.01, max_restarts=5):
+    src = sqlite3.connect(source, timeout=5, isolation_level=None)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0] == 'wal':
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()  # 여기서 읽기 스냅샷이 시작됨
+        progress = {'remaining': None, 'restarts': 0}
+
+        def step(status, remaining, total):
+            if progress['remaining'] is not None and remaining > progress['remaining']:
+                progress['restarts'] += 1
+                if progress['restarts'] > max_restarts:
+                    raise BackupRestarted()
+            progress['remaining'] = remaining
+            time.sleep(pause)
+
+        dst = sqlite3.connect(dest)
+        try:
+            try:
+                src.backup(dst, pages=pages, progress=step)
+            except BackupRestarted:
+                src.backup(dst)
+            dst.execute("PRAGMA journal_mode = DELETE")  # 스냅샷은 -wal 없이 파일 하나로
+        finally:
+            dst.close()
+        return progress['restarts']
+    finally:
+        src.close()
+
+def list_snapshots(directory):
+    if not os.path.isdir(directory):
+        return []
+    names = []
+    for name in os.listdir(directory):
+        try:
+            datetime.strptime(name, SNAPSHOT_FORMAT)
+        except ValueError:
+            continue
+        names.append(name)
+    return sorted(names)
+
+# db_path (+ 있으면 archive_path) 의 스냅샷을 만들고 검사까지 끝낸 뒤 keep 개만 남기고 오래된 것부터 지움
+def take_snapshot(db_path, directory, archive_path=None, keep=None, pages=64, pause=0.01):
+    started = time.time()
+    name = datetime.now().strftime(SNAPSHOT_FORMAT)
+    target = os.path.join(directory, name)
+    partial = target + '.partial'
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    sources = [db_path]
+    if archive_path and os.path.exists(archive_path):
+        sources.append(archive_path)
+    try:
+        restarts = 0
+        for source in sources:
+            dest = os.path.join(partial, os.path.basename(source))
+            restarts += copy_database(source, dest, pages=pages, pause=pause)
+            errors = integrity_errors(dest)
+            if errors:
+                raise sqlite3.DatabaseError(f"{os.path.basename(source)} integrity_check 실패: {errors[:5]}")
+        if os.path.exists(target):  # 같은 초에 두 번 찍은 경우
+            shutil.rmtree(target)
+        os.replace(partial, target)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    removed = rotate_snapshots(directory, keep) if keep else []
+    return {
+        'name': name,
+        'path': target,
+        'files': [os.path.basename(source) for source in sources],
+        'bytes': sum(os.path.getsize(os.path.join(target, os.path.basename(source))) for source in sources),
+        'restarts': restarts,
+        'seconds': round(time.time() - started, 3),
+        'removed': removed,
+    }
+
+def rotate_snapshots(directory, keep):
+    names = list_snapshots(directory)
+    removed = names[:max(0, len(names) - keep)]
+    for name in removed:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    return removed
+
+# 스냅샷을 db_path (+ archive_path) 로 되돌림. 현재 DB는 먼저 <백업 폴더>/<시각>-before-restore/ 로 떠 둠
+# 앱이 떠 있으면 메모리 상태(테이블 현황, 메뉴 캐시 등)가 맞지 않으므로 멈춘 뒤 실행
+def restore_snapshot(name, db_path, directory, archive_path=None):
+    names = list_snapshots(directory)
+    if name == 'latest':
+        if not names:
+            raise FileNotFoundError(f"{directory} 에 스냅샷이 없습니다")
+        name = names[-1]
+    source_dir = os.path.join(directory, name)
+    if name not in names:
+        raise FileNotFoundError(f"스냅샷을 찾을 수 없습니다: {source_dir}")
+    targets = [db_path] + ([archive_path] if archive_path else [])
+    pairs = [
+        (os.path.join(source_dir, os.path.basename(target)), target)
+        for target in targets
+        if os.path.exists(os.path.join(source_dir, os.path.basename(target)))
+    ]
+    # 스냅샷에 없는 파일 (첫 일자 마감 전에 찍은 스냅샷의 아카이브 DB): 그때는 없었으므로 지금 것도 치움.
+    # 남겨 두면 되돌린 라이브 DB에 아직 있는 기록이 아카이브에도 있어서 _history 조회 / 마감에서 겹침
+    stale = [target for target in targets if os.path.exists(target) and target not in [t for _, t in pairs]]
+    for source, _ in pairs:
+        errors = integrity_errors(source)
+        if errors:
+            raise sqlite3.DatabaseError(f"{source} integrity_check 실패: {errors[:5]}")
+
+    saved = base = os.path.join(directory, datetime.now().strftime(SNAPSHOT_FORMAT) + '-before-restore')
+    count = 1
+    while os.path.exists(saved):  # 같은 초에 두 번 되돌려도 이전 사본을 덮어쓰지 않음
+        saved = f"{base}-{count}"
+        count += 1
+    os.makedirs(saved)
+    for target in [t for _, t in pairs] + stale:
+        if os.path.exists(target):
+            copy_database(target, os.path.join(saved, os.path.basename(target)), pages=-1)
+    for target in stale:
+        for path in (target, f"{target}-wal", f"{target}-shm", f"{target}-journal"):
+            if os.path.exists(path):
+                os.remove(path)
+    # 백업 API 로 덮어써야 남아 있는 -wal 파일까지 일관되게 정리됨
+    for source, target in pairs:
+        copy_database(source, target, pages=-1)
+        conn = sqlite3.connect(target)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.close()
+    return name, saved
+
+# interval 초마다 스냅샷을 찍는 스레드. trigger() 로 바로 한 번 찍을 수 있음
+class BackupScheduler:
+    def __init__(self, db_path, directory, archive_path=None, interval=600, keep=36):
+        self.db_path = db_path
+        self.directory = directory
+        self.archive_path = archive_path
+        self.interval = interval
+        self.keep = keep
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.running = False
+        self.last = None        # 마지막 성공한 스냅샷 정보
+        self.last_error = None
+        self.snapshots = 0
+        self.failures = 0
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='backup', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            thread.join()
+
+    # 스케줄러가 돌고 있지 않으면 (BACKUP_INTERVAL=0 등) 한 번만 찍는 스레드를 띄움
+    def trigger(self):
+        if self._thread is not None:
+            self._wake.set()
+        else:
+            threading.Thread(target=self.run_once, name='backup', daemon=True).start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            self.run_once()
+
+    def run_once(self):
+        with self._lock:
+            self.running = True
+            try:
+                self.last = run_native(take_snapshot, self.db_path, self.directory, self.archive_path, keep=self.keep)
+                self.last_error = None
+                self.snapshots += 1
+            except Exception as e:
+                self.last_error = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {e}"
+                self.failures += 1
+            finally:
+                self.running = False
+        return self.last
+
+    def snapshot(self):
+        return {
+            'directory': self.directory,
+            'interval': self.interval,
+            'keep': self.keep,
+            'running': self.running,
+            'snapshots': self.snapshots,
+            'failures': self.failures,
+            'last': self.last,
+            'last_error': self.last_error,
+            'available': list_snapshots(self.directory),
+        }
+
+def run_command(args, archive):
+    if args.command == 'snapshot':
+        info = take_snapshot(args.db, args.dir, archive, keep=args.keep)
+        print(f"{info['name']}: {', '.join(info['files'])} ({info['bytes']} bytes, {info['seconds']}s) -> {info['path']}")
+        for name in info['removed']:
+            print(f"removed {name}")
+    elif args.command == 'list':
+        for name in list_snapshots(args.dir):
+            files = sorted(os.listdir(os.path.join(args.dir, name)))
+            print(f"{name}  {', '.join(files)}")
+    elif not args.name:
+        raise FileNotFoundError(f"{args.command} 에는 스냅샷 이름이 필요합니다")
+    elif args.command == 'verify':
+        snapshot_dir = os.path.join(args.dir, args.name)
+        failed = False
+        for file_name in sorted(os.listdir(snapshot_dir)):
+            errors = integrity_errors(os.path.join(snapshot_dir, file_name))
+            print(f"{file_name}: {'ok' if not errors else errors}")
+            failed = failed or bool(errors)
+        if failed:
+            sys.exit(1)
+    else:
+        name, saved = restore_snapshot(args.name, args.db, args.dir, archive)
+        print(f"Restored {name} -> {args.db} (previous database saved in {saved})")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['snapshot', 'list', 'verify', 'restore'])
+    parser.add_argument('name', nargs='?', help='verify / restore 할 스냅샷 이름 (restore 는 latest 가능)')
+    parser.add_argument('--db', default=create_db.db_path)
+    parser.add_argument('--archive', help='아카이브 DB (기본: <db>_archive.db)')
+    parser.add_argument('--dir', default='backups', help='스냅샷 폴더')
+    parser.add_argument('--keep', type=int, default=36, help='snapshot 후 남길 스냅샷 수 (0 이면 지우지 않음)')
+    args = parser.parse_args()
+    archive = args.archive or create_db.archive_path_for(args.db)
+
+    try:
+        run_command(args, archive)
+    except (OSError, sqlite3.DatabaseError) as e:
+        sys.exit(f"{args.command} 실패: {e}")
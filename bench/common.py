@@ -0,0 +1,32 @@
+# 벤치마크 공용: 새 DB를 만들고 app 모듈이 그 DB를 쓰도록 연결
+
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_db
+import app as pos
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+# workdir 안에 name.db 를 create_db.initialize_database() 로 새로 만들고 app 이 쓰게 함
+def use_fresh_database(workdir, name, **pool_options):
+    db_path = os.path.join(workdir, f"{name}.db")
+    create_db.db_path = db_path
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_db.initialize_database()
+    pos.write_journal.stop()  # 쓰기 스레드는 이전 DB 연결을 들고 있으므로 다음 쓰기 때 새로 시작
+    pos.job_runner.shutdown()  # 이전 DB로 만든 보고서 캐시를 버림
+    pos.DB_PATH = db_path
+    pos.db_pool = pos.ConnectionPool(db_path, **pool_options)
+    pos.invalidate_menu_catalog()
+    pos.floor_state.reset()
+    return db_path
@@ -0,0 +1,170 @@
+# serve.py(eventlet / gevent)로 띄운 서버에서 보고서 / 백업을 만드는 동안 다른 요청의 지연 시간 확인
+#
+#   python bench/export_latency.py --history 200000
+#   python bench/export_latency.py --history 200000 --task backup
+#
+# idle:   아무 작업 없이 메인 화면(/)만 반복 요청
+# export: /jobs/export 로 엑셀 보고서를 만들게 하고, 작업이 끝날 때까지 같은 요청을 반복
+# backup: /admin/backup 으로 스냅샷을 찍게 하고, 끝날 때까지 같은 요청을 반복
+# 작업이 green thread 에서 돌면 그 구간의 max_ms 가 작업 시간만큼 늘어난다 (jobs.run_native).
+# serve.py 와 마찬가지로 eventlet 또는 gevent 가 필요하다.
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from common import create_db, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def fill_history(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO payments (table_num, total_price, payment_time, detail) VALUES (?, ?, ?, ?)",
+        ((i % 18 + 1, 17000, f'2026-01-01 {18 + i % 5}:00:00', json.dumps({str(i % 10 + 1): 2})) for i in range(rows)))
+    conn.executemany(
+        "INSERT INTO done_orders (table_num, menu_id, order_time, done_time) VALUES (?, ?, ?, ?)",
+        ((i % 18 + 1, i % 10 + 1, '2026-01-01 18:00:00', '2026-01-01 18:05:00') for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(workdir, db_path, port):
+    env = dict(os.environ,
+               KENDO_DB_PATH=db_path,
+               KENDO_HOST='127.0.0.1',
+               KENDO_PORT=str(port),
+               KENDO_HTTP_ETAGS='false',     # 매번 화면을 그리도록
+               KENDO_BACKUP_INTERVAL='0',
+               KENDO_BACKUP_DIR=os.path.join(workdir, 'backups'))
+    log_path = os.path.join(workdir, 'serve.log')
+    with open(log_path, 'wb') as log:
+        server = subprocess.Popen([sys.executable, 'serve.py'], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            with open(log_path, encoding='utf-8', errors='replace') as f:
+                sys.exit(f"serve.py 가 종료됨:\n{f.read()}")
+        try:
+            urllib.request.urlopen(base_url + '/', timeout=1).read()
+            return server, base_url
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    sys.exit("serve.py 가 30초 안에 뜨지 않음")
+
+def get(base_url, path):
+    started = time.perf_counter()
+    with urllib.request.urlopen(base_url + path, timeout=60) as response:
+        body = response.read()
+    return (time.perf_counter() - started) * 1000, body
+
+def summary(latencies):
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(max(latencies), 2) if latencies else 0.0,
+    }
+
+# stop 이 set 될 때까지 메인 화면을 반복 요청 (보고서 요청 / 상태 확인과 따로 도는 단말기 하나)
+def probe(base_url, interval, stop, latencies):
+    while not stop.is_set():
+        latencies.append(get(base_url, '/')[0])
+        time.sleep(interval)
+
+def post(base_url, path, body=None):
+    request = urllib.request.Request(base_url + path, data=json.dumps(body or {}).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.load(response)
+
+# 보고서 작업을 맡기고, 끝날 때까지 기다리는 함수를 돌려줌
+def start_export(base_url):
+    job = post(base_url, '/jobs/export', {'report': 'export'})
+    def wait():
+        nonlocal job
+        while job['status'] in ('queued', 'running'):
+            time.sleep(0.2)
+            job = json.loads(get(base_url, f"/jobs/{job['id']}")[1])
+        return {'task_status': job['status'], 'task_seconds': job['seconds'], 'task_error': job['error']}
+    return wait
+
+def start_backup(base_url):
+    state = json.loads(get(base_url, '/admin/backups')[1])
+    finished = state['snapshots'] + state['failures']
+    post(base_url, '/admin/backup')
+    def wait():
+        while True:
+            time.sleep(0.2)
+            state = json.loads(get(base_url, '/admin/backups')[1])
+            if state['snapshots'] + state['failures'] > finished:
+                break
+        return {'task_status': 'failed' if state['last_error'] else 'done',
+                'task_seconds': state['last']['seconds'] if state['last'] else None,
+                'task_error': state['last_error']}
+    return wait
+
+TASKS = {'export': start_export, 'backup': start_backup}
+
+def run(base_url, task, seconds, interval):
+    idle = []
+    stop = threading.Event()
+    prober = threading.Thread(target=probe, args=(base_url, interval, stop, idle))
+    prober.start()
+    time.sleep(seconds)
+    stop.set()
+    prober.join()
+
+    during = []
+    stop = threading.Event()
+    prober = threading.Thread(target=probe, args=(base_url, interval, stop, during))
+    prober.start()
+    started = time.perf_counter()
+    wait = TASKS[task](base_url)
+    submit_ms = (time.perf_counter() - started) * 1000
+    outcome = wait()
+    stop.set()
+    prober.join()
+
+    return {
+        'idle': summary(idle),
+        task: dict(summary(during), submit_ms=round(submit_ms, 2), **outcome),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--history', type=int, default=200000, help='미리 채울 결제 / 완료 기록 수')
+    parser.add_argument('--seconds', type=float, default=3, help='idle 구간 측정 시간')
+    parser.add_argument('--task', choices=sorted(TASKS), default='export')
+    parser.add_argument('--interval-ms', type=float, default=10, help='요청 사이 대기 시간')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'export.db')
+        create_db.db_path = db_path
+        create_db.initialize_database()
+        fill_history(db_path, args.history)
+        server, base_url = start_server(workdir, db_path, free_port())
+        try:
+            result = run(base_url, args.task, args.seconds, args.interval_ms / 1000)
+        finally:
+            server.terminate()
+            server.wait()
+    print(json.dumps(result, indent=2))
+
+if __name__ == '__main__':
+    main()
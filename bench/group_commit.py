@@ -0,0 +1,84 @@
+# 주문 탭이 몰릴 때 쓰기 방식별 처리량 비교
+#
+#   python bench/group_commit.py --threads 32 --seconds 5
+#
+# 스레드마다 자기 테이블에 /order 를 쉬지 않고 보낸다 (쓰기만 있는 최악의 러시).
+# direct: 요청마다 BEGIN IMMEDIATE / COMMIT (WRITE_GROUP_COMMIT=False)
+# group:  쓰기 스레드 하나가 WRITE_COMMIT_WINDOW_MS 동안 모은 요청을 한 번에 커밋
+# 각각 WRITE_DURABILITY full / normal 로 돌린다.
+
+import argparse
+import json
+import tempfile
+import threading
+import time
+
+from common import percentile, pos, use_fresh_database
+from writer import DURABILITY_LEVELS, GroupCommitWriter
+
+MODES = {
+    'direct-full': (False, 'full'),
+    'direct-normal': (False, 'normal'),
+    'group-full': (True, 'full'),
+    'group-normal': (True, 'normal'),
+}
+
+def worker(index, deadline, latencies, stats, lock):
+    client = pos.app.test_client()
+    body = {'table_num': index % 18 + 1, 'menu_name': '교자', 'price': 5000}
+    local = []
+    errors = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = client.post('/order', json=body)
+        local.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            errors += 1
+    with lock:
+        latencies.extend(local)
+        stats['errors'] += errors
+
+def run(mode, threads, seconds, window_ms, workdir):
+    group_commit, durability = MODES[mode]
+    use_fresh_database(workdir, mode, synchronous=DURABILITY_LEVELS[durability])
+    pos.app.config['WRITE_GROUP_COMMIT'] = group_commit
+    pos.write_journal = GroupCommitWriter(lambda: pos.db_pool.connect(), window=window_ms / 1000, durability=durability)
+
+    latencies = []
+    stats = {'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    pool = [threading.Thread(target=worker, args=(i, deadline, latencies, stats, lock)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    pos.write_journal.stop()
+    pos.db_pool.close_all()
+
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'errors': stats['errors'],
+        'commits': pos.write_journal.batches if group_commit else len(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--window-ms', type=float, default=5)
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(mode, args.threads, args.seconds, args.window_ms, workdir) for mode in args.modes]
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
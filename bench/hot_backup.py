@@ -0,0 +1,96 @@
+# 백업 중에도 주문 요청 지연 시간이 유지되는지 확인
+#
+#   python bench/hot_backup.py --threads 8 --seconds 3 --history 200000
+#
+# off:     백업 없음
+# stepped: 64 페이지씩 나눠 복사하고 단계마다 쉼 (backup.py 기본값)
+# oneshot: 한 번에 전체 복사
+# 백업 스레드는 측정하는 동안 스냅샷을 계속 찍는다. 완료 기록(done_orders)을 --history 건 미리 채워서 DB를 키움.
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from common import percentile, pos, use_fresh_database
+import backup
+
+MODES = ['off', 'stepped', 'oneshot']
+
+def worker(index, menus, deadline, latencies, lock):
+    client = pos.app.test_client()
+    local = []
+    n = 0
+    while time.perf_counter() < deadline:
+        menu = menus[(index + n) % len(menus)]
+        n += 1
+        started = time.perf_counter()
+        client.post('/order', json={'table_num': index % 18 + 1, 'menu_name': menu['name'], 'price': menu['price']})
+        local.append((time.perf_counter() - started) * 1000)
+    with lock:
+        latencies.extend(local)
+
+def fill_history(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO done_orders (table_num, menu_id, order_time, done_time) VALUES (?, ?, ?, ?)",
+        ((i % 18 + 1, i % 10 + 1, '2026-01-01 18:00:00', '2026-01-01 18:05:00') for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+def backup_loop(mode, db_path, directory, deadline, snapshots):
+    pages = 64 if mode == 'stepped' else -1
+    while time.perf_counter() < deadline:
+        snapshots.append(backup.take_snapshot(db_path, directory, keep=2, pages=pages))
+
+def run(mode, threads, seconds, history, workdir):
+    db_path = use_fresh_database(workdir, mode)
+    fill_history(db_path, history)
+    with pos.app.app_context():
+        menus = pos.get_menu_catalog().menus
+
+    latencies = []
+    snapshots = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    pool = [threading.Thread(target=worker, args=(i, menus, deadline, latencies, lock)) for i in range(threads)]
+    if mode != 'off':
+        pool.append(threading.Thread(target=backup_loop,
+                                     args=(mode, db_path, os.path.join(workdir, f"{mode}_backups"), deadline, snapshots)))
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    pos.write_journal.stop()
+    pos.db_pool.close_all()
+
+    return {
+        'mode': mode,
+        'db_bytes': os.path.getsize(db_path),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'snapshots': len(snapshots),
+        'snapshot_avg_s': round(sum(s['seconds'] for s in snapshots) / len(snapshots), 3) if snapshots else None,
+        'restarts': sum(s['restarts'] for s in snapshots),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--history', type=int, default=200000, help='미리 채울 완료 기록 수')
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(mode, args.threads, args.seconds, args.history, workdir) for mode in args.modes]
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
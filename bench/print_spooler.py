@@ -0,0 +1,85 @@
+# 티켓 출력이 주문 요청 지연 시간에 영향을 주지 않는지 확인
+#
+#   python bench/print_spooler.py --threads 8 --seconds 3
+#
+# off:     프린터 없음
+# file:    스테이션마다 일반 파일에 출력
+# stalled: 읽는 쪽이 없는 FIFO (프린터가 멈춘 상황, 재시도 후 큐가 차면 버림)
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from common import percentile, pos, use_fresh_database
+from spooler import TicketSpooler
+
+MODES = ['off', 'file', 'stalled']
+
+def worker(index, menus, deadline, latencies, lock):
+    client = pos.app.test_client()
+    local = []
+    n = 0
+    while time.perf_counter() < deadline:
+        menu = menus[(index + n) % len(menus)]
+        n += 1
+        started = time.perf_counter()
+        client.post('/order', json={'table_num': index % 18 + 1, 'menu_name': menu['name'], 'price': menu['price']})
+        local.append((time.perf_counter() - started) * 1000)
+    with lock:
+        latencies.extend(local)
+
+def run(mode, threads, seconds, workdir):
+    use_fresh_database(workdir, mode)
+    devices = {}
+    for i, category in enumerate(pos.MENU_CATEGORY_MAP):
+        path = os.path.join(workdir, f"{mode}_{i}")
+        if mode == 'stalled':
+            os.mkfifo(path)
+        if mode != 'off':
+            devices[category] = path
+    pos.spooler = TicketSpooler(devices, retries=1, retry_delay=0.05)
+    with pos.app.app_context():
+        menus = pos.get_menu_catalog().menus
+
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    pool = [threading.Thread(target=worker, args=(i, menus, deadline, latencies, lock)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    pos.spooler.stop()
+    pos.write_journal.stop()
+    pos.db_pool.close_all()
+
+    printers = pos.spooler.snapshot()
+    return {
+        'mode': mode,
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'printed': sum(printer['printed'] for printer in printers),
+        'failed': sum(printer['failed'] for printer in printers),
+        'dropped': sum(printer['dropped'] for printer in printers),
+        'print_p99_s': max((printer['p99'] or 0 for printer in printers), default=0),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(mode, args.threads, args.seconds, workdir) for mode in args.modes]
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
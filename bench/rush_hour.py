@@ -0,0 +1,233 @@
+# 축제 날 저녁 러시 시나리오 부하 테스트
+#
+#   python bench/rush_hour.py --seconds 20 --target both --output result.json
+#   python bench/rush_hour.py --seconds 20 --baseline result.json
+#
+# - 매장 테이블 18개: 시간 시작 → /order 여러 번 (가끔 /cancel) → /complete/<n> 결제 반복
+# - 테이크아웃: /submit-takeout-orders 를 몰아서 보내는 버스트
+# - 주방 화면 6개: /menu-orders/<category> 를 읽고 대기 주문을 /complete-order 로 완료
+#
+# 대상은 Flask test client(test-client), 실제 로컬 서버(server), 또는 둘 다(both).
+# 결과는 요청 종류별 처리량, p50/p99 지연 시간, 오류 / DB 잠금 오류 수를 JSON 으로 출력.
+
+import argparse
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from werkzeug.serving import make_server
+
+from common import percentile, pos, use_fresh_database
+
+TABLE_COUNT = 18
+ORDER_ID_PATTERN = re.compile(r'"order_id": ?(\d+)')  # 주방 화면에 심어진 대기 주문 JSON
+
+class TestClientDriver:
+    def __init__(self):
+        self.client = pos.app.test_client()
+
+    def request(self, method, path, json_body=None, form=None):
+        response = self.client.open(path, method=method, json=json_body, data=form)
+        return response.status_code, response.get_data(as_text=True)
+
+class HttpDriver:
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def request(self, method, path, json_body=None, form=None):
+        headers = {}
+        data = None
+        if json_body is not None:
+            data = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        url = self.base_url + urllib.parse.quote(path, safe='/?=&')
+        req = urllib.request.Request(url, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return response.status, response.read().decode('utf-8')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace')
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.locked = defaultdict(int)
+
+    # 요청 하나 보내고 종류(name)별로 지연 시간 / 오류 기록
+    def call(self, driver, name, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            status, body = driver.request(method, path, **kwargs)
+        except OSError as e:
+            status, body = 599, str(e)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.latencies[name].append(elapsed_ms)
+            if status >= 400:
+                self.errors[name] += 1
+                if 'locked' in body:
+                    self.locked[name] += 1
+        return status, body
+
+    def report(self, elapsed):
+        names = sorted(self.latencies)
+        all_latencies = [ms for name in names for ms in self.latencies[name]]
+        return {
+            'seconds': round(elapsed, 2),
+            'requests': len(all_latencies),
+            'throughput': round(len(all_latencies) / elapsed, 1),
+            'p50_ms': round(percentile(all_latencies, 50), 2),
+            'p99_ms': round(percentile(all_latencies, 99), 2),
+            'errors': sum(self.errors.values()),
+            'lock_errors': sum(self.locked.values()),
+            'routes': {
+                name: {
+                    'requests': len(self.latencies[name]),
+                    'throughput': round(len(self.latencies[name]) / elapsed, 1),
+                    'p50_ms': round(percentile(self.latencies[name], 50), 2),
+                    'p99_ms': round(percentile(self.latencies[name], 99), 2),
+                    'errors': self.errors[name],
+                    'lock_errors': self.locked[name],
+                }
+                for name in names
+            },
+        }
+
+def think(rng, think_ms):
+    if think_ms:
+        time.sleep(rng.uniform(0, think_ms) / 1000)
+
+def table_actor(driver, recorder, table_num, menus, deadline, rng, think_ms):
+    while time.perf_counter() < deadline:
+        recorder.call(driver, 'start_timer', 'POST', f'/start-timer/{table_num}')
+        recorder.call(driver, 'table', 'GET', f'/table/{table_num}')
+        for _ in range(rng.randint(3, 10)):
+            if time.perf_counter() >= deadline:
+                return
+            menu = rng.choice(menus)
+            body = {'table_num': table_num, 'menu_name': menu['name'], 'price': menu['price']}
+            recorder.call(driver, 'order', 'POST', '/order', json_body=body)
+            if rng.random() < 0.1:
+                recorder.call(driver, 'cancel', 'POST', '/cancel', json_body=body)
+            think(rng, think_ms)
+        recorder.call(driver, 'floor', 'GET', '/')
+        recorder.call(driver, 'pay', 'POST', f'/complete/{table_num}')
+
+def takeout_actor(driver, recorder, menus, deadline, rng, think_ms):
+    while time.perf_counter() < deadline:
+        recorder.call(driver, 'takeout_page', 'GET', '/takeout')
+        for _ in range(rng.randint(2, 6)):  # 한꺼번에 몰리는 주문
+            orders = {}
+            for menu in rng.sample(menus, rng.randint(1, 4)):
+                orders[menu['name']] = {'count': rng.randint(1, 3), 'price': menu['price']}
+            recorder.call(driver, 'takeout_submit', 'POST', '/submit-takeout-orders',
+                          json_body={'orders': orders, 'memo': ''})
+        think(rng, think_ms * 10)
+
+def kitchen_actor(driver, recorder, category, deadline, rng, think_ms):
+    while time.perf_counter() < deadline:
+        status, body = recorder.call(driver, 'station', 'GET', f'/menu-orders/{category}')
+        order_ids = [int(order_id) for order_id in ORDER_ID_PATTERN.findall(body)] if status == 200 else []
+        if len(order_ids) > 1 and rng.random() < 0.5:
+            # 한 판 완료
+            recorder.call(driver, 'complete_batch', 'POST', '/complete-batch',
+                          json_body={'order_ids': order_ids[:rng.randint(2, 6)]})
+        else:
+            for order_id in order_ids[:rng.randint(1, 3)]:
+                recorder.call(driver, 'complete_order', 'POST', '/complete-order',
+                              form={'order_id': order_id, 'menu_name': '', 'table_num': '', 'category': category})
+        think(rng, think_ms * 5)
+
+def run(target, seconds, think_ms, seed, workdir):
+    use_fresh_database(workdir, f"rush_{target}")
+    with pos.app.app_context():
+        catalog = pos.get_menu_catalog()
+    server = None
+    if target == 'server':
+        server = make_server('127.0.0.1', 0, pos.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        make_driver = lambda: HttpDriver(f'http://127.0.0.1:{server.server_port}')
+    else:
+        make_driver = TestClientDriver
+
+    recorder = Recorder()
+    deadline = time.perf_counter() + seconds
+    actors = []
+    for table_num in range(1, TABLE_COUNT + 1):
+        actors.append((table_actor, (table_num, catalog.menus)))
+    actors.append((takeout_actor, (catalog.takeout_menus,)))
+    for category in pos.MENU_CATEGORY_MAP:
+        actors.append((kitchen_actor, (category,)))
+
+    threads = [
+        threading.Thread(target=actor, args=(make_driver(), recorder, *args, deadline, random.Random(seed + i), think_ms))
+        for i, (actor, args) in enumerate(actors)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if server is not None:
+        server.shutdown()
+    pos.write_journal.stop()
+    pos.db_pool.close_all()
+    result = recorder.report(elapsed)
+    result['target'] = target
+    return result
+
+# 기준 결과(baseline)와 비교한 처리량 / p99 변화
+def compare(results, baseline):
+    by_target = {result['target']: result for result in baseline}
+    comparison = {}
+    for result in results:
+        base = by_target.get(result['target'])
+        if base:
+            comparison[result['target']] = {
+                'throughput_ratio': round(result['throughput'] / base['throughput'], 3) if base['throughput'] else None,
+                'p99_ratio': round(result['p99_ms'] / base['p99_ms'], 3) if base['p99_ms'] else None,
+                'lock_errors_delta': result['lock_errors'] - base['lock_errors'],
+            }
+    return comparison
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--target', choices=['test-client', 'server', 'both'], default='both')
+    parser.add_argument('--think-ms', type=float, default=20, help='요청 사이 최대 대기 시간')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='결과 JSON 저장 경로')
+    parser.add_argument('--baseline', help='비교할 이전 결과 JSON')
+    args = parser.parse_args()
+
+    targets = ['test-client', 'server'] if args.target == 'both' else [args.target]
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(target, args.seconds, args.think_ms, args.seed, workdir) for target in targets]
+
+    output = {'results': results}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            output['comparison'] = compare(results, json.load(f)['results'])
+
+    text = json.dumps(output, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+if __name__ == '__main__':
+    main()
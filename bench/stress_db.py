@@ -0,0 +1,77 @@
+# 동시 /order + /menu-orders 부하에서 DB 연결 방식별 초당 처리량 비교
+#
+#   python bench/stress_db.py --threads 8 --seconds 5
+#
+# legacy: 요청마다 새 연결, 기본 롤백 저널 (기존 get_db_connection 방식)
+# pooled: ConnectionPool + WAL / synchronous=NORMAL / busy_timeout
+# 연결 방식만 비교하도록 두 모드 모두 그룹 커밋은 끔 (요청 스레드에서 바로 커밋, 그룹 커밋은 group_commit.py)
+
+import argparse
+import json
+import tempfile
+import threading
+import time
+
+from common import pos, use_fresh_database
+
+MODES = {
+    'legacy': {'size': 0, 'tuned': False},
+    'pooled': {'size': 16, 'tuned': True},
+}
+
+def worker(index, deadline, stats, lock):
+    client = pos.app.test_client()
+    categories = list(pos.MENU_CATEGORY_MAP)
+    done = errors = locked = 0
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+        if index % 2 == 0:
+            response = client.post('/order', json={
+                'table_num': (index + n) % 18 + 1,
+                'menu_name': '타코야끼 (데리야끼)',
+                'price': 8500
+            })
+        else:
+            response = client.get(f"/menu-orders/{categories[n % len(categories)]}")
+        done += 1
+        if response.status_code != 200:
+            errors += 1
+            if 'locked' in response.get_data(as_text=True):
+                locked += 1
+    with lock:
+        stats['requests'] += done
+        stats['errors'] += errors
+        stats['locked'] += locked
+
+def run(mode, threads, seconds, workdir):
+    use_fresh_database(workdir, mode, **MODES[mode])
+    pos.app.config['WRITE_GROUP_COMMIT'] = False
+    stats = {'requests': 0, 'errors': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    pool = [threading.Thread(target=worker, args=(i, deadline, stats, lock)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    pos.db_pool.close_all()
+    stats['mode'] = mode
+    stats['requests_per_sec'] = round(stats['requests'] / elapsed, 1)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(mode, args.threads, args.seconds, workdir) for mode in args.modes]
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# /submit-takeout-orders 장바구니 크기(주문 행 수)별 처리 시간
+#
+#   python bench/takeout_submit.py --rounds 200
+#
+# 주문 행을 executemany 한 번으로 넣기 때문에 1줄 / 10줄 / 100줄 장바구니의
+# 지연 시간이 거의 같아야 한다.
+
+import argparse
+import json
+import tempfile
+import time
+
+from common import percentile, pos, use_fresh_database
+
+BASKET_SIZES = [1, 10, 100]
+
+# menus 를 돌아가며 총 size 줄이 되도록 장바구니 구성
+def make_basket(menus, size):
+    orders = {}
+    for i in range(size):
+        menu = menus[i % len(menus)]
+        item = orders.setdefault(menu['name'], {'count': 0, 'price': menu['price']})
+        item['count'] += 1
+    return {'orders': orders, 'memo': ''}
+
+def run(size, rounds, workdir):
+    use_fresh_database(workdir, f"basket_{size}")
+    client = pos.app.test_client()
+    with pos.app.app_context():
+        menus = pos.get_menu_catalog().takeout_menus
+    basket = make_basket(menus, size)
+
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        response = client.post('/submit-takeout-orders', json=basket)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    pos.db_pool.close_all()
+
+    return {
+        'lines': size,
+        'rounds': rounds,
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(size, args.rounds, workdir) for size in BASKET_SIZES]
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
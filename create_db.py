@@ -2,6 +2,12 @@
 
 import sqlite3
 import json
+import argparse
+import ast
+import os
+import sys
+import tempfile
+import uuid
 from datetime import datetime
 
 # 데이터베이스 파일 생성
@@ -13,97 +19,97 @@ def dict_factory(cursor, row):
         d[col[0]] = row[idx]
     return d
 
-def create_tables():
-    # SQLite connection with Korean support
-    conn = sqlite3.connect(db_path)
-    conn.execute("PRAGMA foreign_keys = ON")
-    conn.execute("PRAGMA encoding = 'UTF-8'")
-    
-    # Enable Korean text output
-    def dict_factory(cursor, row):
-        d = {}
-        for idx, col in enumerate(cursor.description):
-            d[col[0]] = row[idx]
-        return d
-    
-    conn.row_factory = dict_factory
-    conn.text_factory = str
-    cur = conn.cursor()
-
-    # Pragma 설정으로 한글 인코딩 지원
-    cur.execute("PRAGMA encoding = 'UTF-8'")
+# 카테고리별 메뉴 이름 매핑 (주방 스테이션 단위, menu_items.category 초기값)
+MENU_CATEGORY_MAP = {
+    "타코야끼": ["타코야끼 (데리야끼)", "타코야끼 (불닭)"],
+    "야끼소바": ["야끼소바 (간장)", "야끼소바 (불닭)"],
+    "우삼겹숙주볶음": ["우삼겹숙주볶음"],
+    "나가사키해물우동": ["나가사키해물우동"],
+    "사이드": ["흑당인절미 당고", "황도", "교자"],
+    "음료": [
+        "메론소다", "청포도 에이드", "망고 에이드", "아망추",
+        "선라이즈", "로이 로저스", "신데렐라",
+        "하이볼 키트"
+    ]
+}
 
-    # orders 테이블 생성 (실시간 주문 관리)
-    cur.execute("DROP TABLE IF EXISTS orders")
+# menu_items 테이블 생성 (메뉴 한 줄에 하나, 다른 테이블은 menu_id 로 참조)
+# 가격이 NULL 이면 그 쪽(매장 / 테이크아웃)에서는 팔지 않는 메뉴, category 가 NULL 이면 주방을 거치지 않는 메뉴
+def create_menu_items(cur):
     cur.execute("""
-    CREATE TABLE IF NOT EXISTS orders (
+    CREATE TABLE IF NOT EXISTS menu_items (
+        menu_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        category TEXT,
+        dine_in_price INTEGER,
+        takeout_price INTEGER
+    )
+    """)
+
+# 매장 / 테이크아웃 메뉴 목록([{'name', 'price'}])을 합쳐서 menu_items 행으로 (매장 메뉴 순서 먼저)
+def menu_item_rows(menus, takeout_menus):
+    rows = {}
+    category_of = {name: category for category, names in MENU_CATEGORY_MAP.items() for name in names}
+    for menu in menus:
+        rows[menu['name']] = [menu['name'], category_of.get(menu['name']), menu['price'], None]
+    for menu in takeout_menus:
+        rows.setdefault(menu['name'], [menu['name'], category_of.get(menu['name']), None, None])[3] = menu['price']
+    return [tuple(row) for row in rows.values()]
+
+# orders 테이블 생성 (실시간 주문 관리)
+def create_orders(cur, name='orders'):
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {name} (
         order_id INTEGER PRIMARY KEY AUTOINCREMENT,
         table_num INTEGER NOT NULL,
-        menu_name TEXT NOT NULL,
+        menu_id INTEGER NOT NULL REFERENCES menu_items(menu_id),
         price INTEGER NOT NULL,
         time TEXT NOT NULL,
         etc TEXT
     )
     """)
 
-    # table_orders 테이블 생성 (테이블별 현재 상태)
-    cur.execute("DROP TABLE IF EXISTS table_orders")
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS table_orders (
-        table_num INTEGER PRIMARY KEY,
-        tbl_orders TEXT NOT NULL,
-        people INTEGER DEFAULT 0,
-        total_price INTEGER DEFAULT 0,
-        memo TEXT,
-        entrance_time TEXT,
-        end_time TEXT
-    )
-    """)
-
-    # menu 테이블 생성
-    cur.execute("DROP TABLE IF EXISTS menu")
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS menu (
-        menu_json TEXT NOT NULL
-    )
+# table_items 테이블 생성 (테이블별 주문 수량, total_price는 트리거로 유지)
+def create_table_items(cur, name='table_items'):
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {name} (
+        table_num INTEGER NOT NULL REFERENCES table_orders(table_num),
+        menu_id INTEGER NOT NULL REFERENCES menu_items(menu_id),
+        qty INTEGER NOT NULL DEFAULT 0 CHECK (qty >= 0),
+        price INTEGER NOT NULL,
+        PRIMARY KEY (table_num, menu_id)
+    ) WITHOUT ROWID
     """)
 
-    # menu_to 테이블 생성
-    cur.execute("DROP TABLE IF EXISTS menu_to")
-    cur.execute('''
-    CREATE TABLE IF NOT EXISTS menu_to (
-        menu_json TEXT
-    )
-    ''')
-
-    # done_orders 테이블 생성 (완료된 주문)
-    cur.execute("DROP TABLE IF EXISTS done_orders")
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS done_orders (
+# 지난 기록 테이블은 아카이브 DB에도 같은 스키마로 만들어지므로 menu_items 를 REFERENCES 로 걸지 않음
+# done_orders 테이블 생성 (완료된 주문)
+def create_done_orders(cur, name='done_orders'):
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {name} (
         done_id INTEGER PRIMARY KEY AUTOINCREMENT,
         table_num INTEGER NOT NULL,
-        menu TEXT NOT NULL,
+        menu_id INTEGER NOT NULL,
         order_time TEXT NOT NULL,
         done_time TEXT NOT NULL
     )
     """)
 
-    # deleted_orders 테이블 생성 (취소된 주문)
-    cur.execute("DROP TABLE IF EXISTS deleted_orders")
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS deleted_orders (
+# deleted_orders 테이블 생성 (취소된 주문)
+def create_deleted_orders(cur, name='deleted_orders'):
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {name} (
         delete_id INTEGER PRIMARY KEY AUTOINCREMENT,
         table_num INTEGER NOT NULL,
-        menu TEXT NOT NULL,
+        menu_id INTEGER NOT NULL,
         order_time TEXT NOT NULL,
         delete_time TEXT NOT NULL
     )
     """)
 
-    # payments 테이블 생성 (결제 내역)
-    cur.execute("DROP TABLE IF EXISTS payments")
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS payments (
+# payments 테이블 생성 (결제 내역, detail 은 {"menu_id": 수량} JSON)
+def create_payments(cur, name='payments'):
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {name} (
         payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
         table_num INTEGER NOT NULL,
         total_price INTEGER NOT NULL,
@@ -117,6 +123,207 @@ def create_tables():
     )
     """)
 
+# table_orders 행이 바뀌면 (table_items 트리거가 금액을 바꾼 경우 포함) 같은 트랜잭션 안에서 version +1
+def create_table_orders_triggers(cur):
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS table_orders_version AFTER UPDATE ON table_orders
+    WHEN NEW.version = OLD.version
+    BEGIN
+        UPDATE table_orders SET version = OLD.version + 1 WHERE table_num = NEW.table_num;
+    END
+    """)
+
+def create_table_items_triggers(cur):
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS table_items_insert AFTER INSERT ON table_items
+    BEGIN
+        UPDATE table_orders SET total_price = total_price + NEW.qty * NEW.price
+        WHERE table_num = NEW.table_num;
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS table_items_update AFTER UPDATE OF qty ON table_items
+    BEGIN
+        UPDATE table_orders SET total_price = total_price + (NEW.qty - OLD.qty) * NEW.price
+        WHERE table_num = NEW.table_num;
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS table_items_delete AFTER DELETE ON table_items
+    BEGIN
+        UPDATE table_orders SET total_price = total_price - OLD.qty * OLD.price
+        WHERE table_num = OLD.table_num;
+    END
+    """)
+
+# 조회 경로별 인덱스 (app.py의 자주 쓰는 쿼리가 전체 스캔하지 않도록)
+def create_indexes(cur):
+    # view_menu_orders: WHERE menu_id IN (...)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_menu ON orders (menu_id, table_num)")
+    # cancel_table_items: WHERE table_num = ? AND menu_id = ? ORDER BY order_id DESC (order_id가 인덱스 끝에 붙어 있어 정렬 없이 최근 것부터)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_table_menu ON orders (table_num, menu_id)")
+    # 테이크아웃 번호는 sequences 에서 발급하므로 MAX(table_num) 용 인덱스는 필요 없음 (결제마다 쓰기 비용만 듦)
+    cur.execute("DROP INDEX IF EXISTS idx_payments_table")
+    # 완료 목록은 done_id 순서이므로 시간 인덱스는 기간 조회용으로만 (예전의 넓은 인덱스는 지우고 다시 만듦)
+    cur.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = 'idx_done_orders_time'")
+    row = cur.fetchone()
+    if row and not row['sql'].endswith('(done_time)'):
+        cur.execute("DROP INDEX idx_done_orders_time")
+    # 기간 조회 / 일자 마감: WHERE payment_time / done_time / delete_time 범위
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_done_orders_time ON done_orders (done_time)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_payments_time ON payments (payment_time)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_deleted_orders_time ON deleted_orders (delete_time)")
+
+# sequences 테이블 생성 (테이크아웃 번호 등 다음에 발급할 번호)
+def create_sequences(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sequences (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """)
+
+# 매출 집계 테이블 생성 (payments 가 추가될 때 트리거로 누적, /payments 요약은 여기서 바로 읽음)
+def create_sales_summary(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sales_summary (
+        scope TEXT PRIMARY KEY,               /* total / dine_in / takeout */
+        revenue INTEGER NOT NULL DEFAULT 0,
+        payments INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sales_by_menu (
+        menu_id INTEGER PRIMARY KEY,
+        qty INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sales_by_hour (
+        hour TEXT PRIMARY KEY,                /* YYYY-MM-DD HH */
+        revenue INTEGER NOT NULL DEFAULT 0,
+        payments INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """)
+
+def create_sales_summary_triggers(cur):
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS payments_sales_summary AFTER INSERT ON payments
+    BEGIN
+        INSERT INTO sales_summary (scope, revenue, payments)
+        VALUES ('total', NEW.total_price, 1),
+               (CASE WHEN NEW.table_num >= 20 THEN 'takeout' ELSE 'dine_in' END, NEW.total_price, 1)
+        ON CONFLICT (scope) DO UPDATE
+        SET revenue = revenue + excluded.revenue, payments = payments + 1;
+
+        INSERT INTO sales_by_hour (hour, revenue, payments)
+        VALUES (substr(NEW.payment_time, 1, 13), NEW.total_price, 1)
+        ON CONFLICT (hour) DO UPDATE
+        SET revenue = revenue + excluded.revenue, payments = payments + 1;
+
+        INSERT INTO sales_by_menu (menu_id, qty)
+        SELECT key, value FROM json_each(NEW.detail) WHERE value > 0
+        ON CONFLICT (menu_id) DO UPDATE SET qty = qty + excluded.qty;
+    END
+    """)
+
+# 기존 payments 로 집계 테이블을 처음부터 다시 계산
+def rebuild_sales_summary(cur):
+    cur.execute("DELETE FROM sales_summary")
+    cur.execute("DELETE FROM sales_by_hour")
+    cur.execute("DELETE FROM sales_by_menu")
+    cur.execute("""
+    INSERT INTO sales_summary (scope, revenue, payments)
+    SELECT 'total', IFNULL(SUM(total_price), 0), COUNT(*) FROM payments
+    UNION ALL
+    SELECT CASE WHEN table_num >= 20 THEN 'takeout' ELSE 'dine_in' END, SUM(total_price), COUNT(*)
+    FROM payments GROUP BY table_num >= 20
+    """)
+    cur.execute("""
+    INSERT INTO sales_by_hour (hour, revenue, payments)
+    SELECT substr(payment_time, 1, 13), SUM(total_price), COUNT(*)
+    FROM payments GROUP BY substr(payment_time, 1, 13)
+    """)
+    cur.execute("""
+    INSERT INTO sales_by_menu (menu_id, qty)
+    SELECT detail.key, SUM(detail.value)
+    FROM payments, json_each(payments.detail) AS detail
+    WHERE detail.value > 0
+    GROUP BY detail.key
+    """)
+
+def create_tables(path=None):
+    # SQLite connection with Korean support
+    conn = sqlite3.connect(path or db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA encoding = 'UTF-8'")
+    
+    # Enable Korean text output
+    def dict_factory(cursor, row):
+        d = {}
+        for idx, col in enumerate(cursor.description):
+            d[col[0]] = row[idx]
+        return d
+    
+    conn.row_factory = dict_factory
+    conn.text_factory = str
+    cur = conn.cursor()
+
+    # Pragma 설정으로 한글 인코딩 지원
+    cur.execute("PRAGMA encoding = 'UTF-8'")
+
+    # menu_items 테이블 생성 (예전 menu / menu_to JSON 테이블은 삭제)
+    cur.execute("DROP TABLE IF EXISTS orders")
+    cur.execute("DROP TABLE IF EXISTS table_items")
+    cur.execute("DROP TABLE IF EXISTS menu")
+    cur.execute("DROP TABLE IF EXISTS menu_to")
+    cur.execute("DROP TABLE IF EXISTS menu_items")
+    create_menu_items(cur)
+
+    # orders 테이블 생성 (실시간 주문 관리)
+    create_orders(cur)
+
+    # table_orders 테이블 생성 (테이블별 현재 상태)
+    cur.execute("DROP TABLE IF EXISTS table_orders")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS table_orders (
+        table_num INTEGER PRIMARY KEY,
+        people INTEGER DEFAULT 0,
+        total_price INTEGER DEFAULT 0,
+        memo TEXT,
+        entrance_time TEXT,
+        end_time TEXT,
+        version INTEGER NOT NULL DEFAULT 0  /* 바뀔 때마다 +1 (트리거), 메모리 테이블 현황의 순서 / 다른 워커 갱신 확인용 */
+    )
+    """)
+    create_table_orders_triggers(cur)
+
+    create_table_items(cur)
+    create_table_items_triggers(cur)
+
+    cur.execute("DROP TABLE IF EXISTS done_orders")
+    create_done_orders(cur)
+    cur.execute("DROP TABLE IF EXISTS deleted_orders")
+    create_deleted_orders(cur)
+    cur.execute("DROP TABLE IF EXISTS payments")
+    create_payments(cur)
+
+    # sequences 테이블 생성
+    cur.execute("DROP TABLE IF EXISTS sequences")
+    create_sequences(cur)
+
+    # 매출 집계 테이블 생성
+    cur.execute("DROP TABLE IF EXISTS sales_summary")
+    cur.execute("DROP TABLE IF EXISTS sales_by_menu")
+    cur.execute("DROP TABLE IF EXISTS sales_by_hour")
+    create_sales_summary(cur)
+    create_sales_summary_triggers(cur)
+
+    create_indexes(cur)
+
+    cur.execute("DROP TABLE IF EXISTS db_meta")
+    create_db_meta(cur)
+
     conn.commit()
     conn.close()
 
@@ -154,10 +361,6 @@ def insert_initial_data():
         ]
     }
 
-    # Insert menu data with UTF-8 encoding
-    menu_json = json.dumps(menu_data, ensure_ascii=False).encode('utf-8').decode('utf-8')
-    cur.execute("INSERT INTO menu (menu_json) VALUES (?)", (menu_json,))
-
     menu_to_data = {
         "menus": [
             { "name": "타코야끼 (데리야끼)", "price": 6500 },
@@ -176,47 +379,30 @@ def insert_initial_data():
         ]
     }
 
-    # Insert menu data with UTF-8 encoding
-    menu_to_json = json.dumps(menu_to_data, ensure_ascii=False).encode('utf-8').decode('utf-8')
-    cur.execute("INSERT INTO menu_to (menu_json) VALUES (?)", (menu_to_json,))
-
-    # Initial orders data
-    initial_orders = {
-        "타코야끼 (데리야끼)": 0,
-        "타코야끼 (불닭)": 0,
-        "야끼소바 (간장)": 0,
-        "야끼소바 (불닭)": 0,
-        "우삼겹숙주볶음": 0,
-        "나가사키해물우동": 0,
-        "흑당인절미 당고": 0,
-        "황도": 0,
-        "교자": 0,
-        "메론소다": 0,
-        "청포도 에이드": 0,
-        "망고 에이드": 0,
-        "아망추": 0,
-        "선라이즈": 0,
-        "로이 로저스": 0,
-        "신데렐라": 0,
-        "하이볼 키트": 0,
-        "입장료 + 자릿세": 0,
-        "콜키지 1L 미만": 0,
-        "콜키지 1L 이상": 0
-    }
+    cur.executemany("""
+    INSERT INTO menu_items (name, category, dine_in_price, takeout_price)
+    VALUES (?, ?, ?, ?)
+    """, menu_item_rows(menu_data['menus'], menu_to_data['menus']))
 
-    # Insert table orders with UTF-8 encoding
-    orders_json = json.dumps(initial_orders, ensure_ascii=False).encode('utf-8').decode('utf-8')
-    
     for table_num in range(1, 19):  # 1번부터 18번 테이블
         cur.execute("""
-        INSERT INTO table_orders (table_num, tbl_orders, people, total_price, memo, entrance_time, end_time)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (table_num, orders_json, 0, 0, "", "", ""))
+        INSERT INTO table_orders (table_num, people, total_price, memo, entrance_time, end_time)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, (table_num, 0, 0, "", "", ""))
+
+    # 테이크아웃 번호는 20번부터
+    cur.execute("INSERT INTO sequences (name, value) VALUES ('takeout', 20)")
 
     conn.commit()
     conn.close()
 
 def initialize_database():
+    # 새 DB는 AUTOINCREMENT 가 1부터 다시 시작하므로 이전 아카이브는 옆으로 치워 둠
+    archive_path = archive_path_for(db_path)
+    if os.path.exists(archive_path):
+        rotated = f"{os.path.splitext(archive_path)[0]}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db"
+        os.replace(archive_path, rotated)
+        print(f"Moved previous archive to {rotated}")
     print(f"Creating database: {db_path}")
     create_tables()
     print("Tables created successfully")
@@ -224,5 +410,396 @@ def initialize_database():
     print("Initial data inserted successfully")
     print(f"Database '{db_path}' has been initialized successfully!")
 
+def table_columns(cur, table, schema='main'):
+    return [row['name'] for row in cur.execute(f"PRAGMA {schema}.table_info({table})")]
+
+# 메뉴 이름 문자열을 저장하던 테이블: (테이블, 이름 컬럼, 새 스키마 생성 함수)
+MENU_NAME_COLUMNS = (
+    ('orders', 'menu_name', create_orders),
+    ('table_items', 'menu_name', create_table_items),
+    ('done_orders', 'menu', create_done_orders),
+    ('deleted_orders', 'menu', create_deleted_orders),
+)
+
+# 테이블을 menu_id 컬럼을 가진 새 스키마로 다시 만들고 이름 → menu_id 로 옮겨 담음
+def replace_menu_names(cur, schema, table, column, create):
+    seq = cur.execute(f"SELECT seq FROM {schema}.sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    create(cur, f"{schema}.{table}_new")
+    columns = table_columns(cur, f"{table}_new", schema)
+    select = ', '.join('menu_items.menu_id' if name == 'menu_id' else f'old.{name}' for name in columns)
+    cur.execute(f"""
+    INSERT INTO {schema}.{table}_new ({', '.join(columns)})
+    SELECT {select} FROM {schema}.{table} AS old JOIN main.menu_items ON menu_items.name = old.{column}
+    """)
+    cur.execute(f"DROP TABLE {schema}.{table}")
+    cur.execute(f"ALTER TABLE {schema}.{table}_new RENAME TO {table}")
+    if seq:
+        # 지워진 주문 번호가 다시 발급되지 않도록 AUTOINCREMENT 값을 그대로 유지
+        cur.execute(f"DELETE FROM {schema}.sqlite_sequence WHERE name = ?", (table,))
+        cur.execute(f"INSERT INTO {schema}.sqlite_sequence (name, seq) VALUES (?, ?)", (table, seq['seq']))
+
+# menu / menu_to JSON 과 메뉴 이름 문자열 컬럼 -> menu_items 테이블 + menu_id
+# 아카이브 DB가 있으면 같이 바꿈 (menu_items 가 이미 있으면 아무것도 안 함)
+def migrate_menu_items(conn, archive_path):
+    cur = conn.cursor()
+    tables = [row['name'] for row in cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    if 'menu_items' in tables:
+        return
+    schemas = ['main']
+    if os.path.exists(archive_path):
+        cur.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+        schemas.append('archive')
+
+    cur.execute("BEGIN IMMEDIATE")
+    create_menu_items(cur)
+    menus = takeout_menus = []
+    if 'menu' in tables:
+        row = cur.execute("SELECT menu_json FROM menu").fetchone()
+        menus = json.loads(row['menu_json'])['menus'] if row else []
+    if 'menu_to' in tables:
+        row = cur.execute("SELECT menu_json FROM menu_to").fetchone()
+        takeout_menus = json.loads(row['menu_json'])['menus'] if row and row['menu_json'] else []
+    cur.executemany("""
+    INSERT INTO menu_items (name, category, dine_in_price, takeout_price)
+    VALUES (?, ?, ?, ?)
+    """, menu_item_rows(menus, takeout_menus))
+
+    # 메뉴판에서 빠졌지만 기록에 남아 있는 이름도 가격 없이 등록해서 행이 사라지지 않게 함
+    detail_json = "CASE WHEN json_valid(payments.detail) THEN payments.detail ELSE '{}' END"
+    for schema in schemas:
+        for table, column, create in MENU_NAME_COLUMNS:
+            if column in table_columns(cur, table, schema):
+                cur.execute(f"INSERT OR IGNORE INTO main.menu_items (name) SELECT DISTINCT {column} FROM {schema}.{table}")
+        if table_columns(cur, 'payments', schema):
+            cur.execute(f"""
+            INSERT OR IGNORE INTO main.menu_items (name)
+            SELECT DISTINCT detail.key FROM {schema}.payments, json_each({detail_json}) AS detail
+            """)
+
+    # 트리거가 예전 컬럼을 가리키고 있으면 테이블 이름을 바꿀 수 없으므로 먼저 지우고 마지막에 다시 만듦
+    cur.execute("DROP TRIGGER IF EXISTS payments_sales_summary")
+    for name in ('table_items_insert', 'table_items_update', 'table_items_delete'):
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for schema in schemas:
+        for table, column, create in MENU_NAME_COLUMNS:
+            if column in table_columns(cur, table, schema):
+                replace_menu_names(cur, schema, table, column, create)
+        # payments.detail: {"메뉴 이름": 수량} -> {"menu_id": 수량}
+        if table_columns(cur, 'payments', schema):
+            cur.execute(f"""
+            UPDATE {schema}.payments SET detail = (
+                SELECT json_group_object((SELECT menu_id FROM main.menu_items WHERE name = detail.key), detail.value)
+                FROM json_each(payments.detail) AS detail
+            )
+            WHERE json_valid(detail)
+            """)
+    if 'menu_name' in table_columns(cur, 'sales_by_menu'):
+        cur.execute("DROP TABLE sales_by_menu")
+        create_sales_summary(cur)
+        rebuild_sales_summary(cur)
+    cur.execute("DROP TABLE IF EXISTS menu")
+    cur.execute("DROP TABLE IF EXISTS menu_to")
+    conn.commit()
+    if 'archive' in schemas:
+        cur.execute("DETACH DATABASE archive")
+    print("Migrated menu names to menu_items / menu_id")
+
+# 기존 데이터를 유지한 채 스키마만 최신으로 맞춤 (여러 번 실행해도 안전)
+def migrate_database(path=None):
+    path = path or db_path
+    conn = sqlite3.connect(path)
+    conn.row_factory = dict_factory
+    cur = conn.cursor()
+
+    migrate_menu_items(conn, archive_path_for(path))
+
+    columns = table_columns(cur, 'table_orders')
+    if 'tbl_orders' in columns:
+        # tbl_orders JSON -> table_items 행 (트리거 생성 전에 넣어서 total_price를 건드리지 않음)
+        create_table_items(cur)
+        for row in cur.execute("SELECT table_num, tbl_orders FROM table_orders").fetchall():
+            for menu_name, qty in json.loads(row['tbl_orders'] or '{}').items():
+                if qty > 0:
+                    cur.execute("INSERT OR IGNORE INTO menu_items (name) VALUES (?)", (menu_name,))
+                    cur.execute("""
+                    INSERT OR REPLACE INTO table_items (table_num, menu_id, qty, price)
+                    SELECT ?, menu_id, ?, IFNULL(dine_in_price, 0) FROM menu_items WHERE name = ?
+                    """, (row['table_num'], qty, menu_name))
+        cur.execute("ALTER TABLE table_orders DROP COLUMN tbl_orders")
+        print("Migrated table_orders.tbl_orders to table_items")
+
+    if 'version' not in table_columns(cur, 'table_orders'):
+        cur.execute("ALTER TABLE table_orders ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    create_table_orders_triggers(cur)
+
+    create_table_items(cur)
+    create_table_items_triggers(cur)
+    create_indexes(cur)
+
+    # 기존 결제 내역의 마지막 테이크아웃 번호 다음부터 발급
+    create_sequences(cur)
+    cur.execute("""
+    INSERT OR IGNORE INTO sequences (name, value)
+    SELECT 'takeout', MAX(20, IFNULL(MAX(table_num) + 1, 20)) FROM payments WHERE table_num >= 20
+    """)
+
+    # 매출 집계 테이블이 새로 생기면 지금까지의 payments 로 채움
+    tables = [row['name'] for row in cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    if 'sales_summary' not in tables:
+        create_sales_summary(cur)
+        rebuild_sales_summary(cur)
+        print("Built sales summary from payments")
+    create_sales_summary_triggers(cur)
+    create_db_meta(cur)
+
+    conn.commit()
+    migrate_archive(conn, archive_path_for(path))
+    conn.close()
+
+# 지난 기록 테이블 → 기준 시각 컬럼. 일자 마감 때 아카이브 DB로 옮겨짐
+ARCHIVE_TABLES = {
+    'payments': 'payment_time',
+    'done_orders': 'done_time',
+    'deleted_orders': 'delete_time',
+}
+ARCHIVE_ID_COLUMNS = {
+    'payments': 'payment_id',
+    'done_orders': 'done_id',
+    'deleted_orders': 'delete_id',
+}
+
+# DB 파일마다 한 번 정해지는 식별자. 아카이브 행의 source 로 써서 DB를 새로 만들어도
+# (AUTOINCREMENT 가 1부터 다시 시작해도) 예전 DB에서 옮긴 행과 섞이지 않게 함
+def create_db_meta(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS db_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    """)
+    cur.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('database_id', ?)", (uuid.uuid4().hex,))
+
+def database_id(cur):
+    return cur.execute("SELECT value FROM main.db_meta WHERE key = 'database_id'").fetchone()[0]
+
+def live_columns(cur, table):
+    return [row[1] for row in cur.execute(f"PRAGMA main.table_info({table})")]
+
+# 아카이브 테이블: 자체 키(archive_id) + 옮겨 온 DB(source) + 라이브 테이블 컬럼
+# 원래 id 는 (id, source) 로만 유일함 (같은 DB에서 두 번 옮겨도 중복되지 않음)
+def create_archive_table(cur, table):
+    columns = ', '.join(f"{row[1]} {row[2]}" for row in cur.execute(f"PRAGMA main.table_info({table})").fetchall())
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS archive.{table} (
+        archive_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT NOT NULL,
+        {columns},
+        UNIQUE ({ARCHIVE_ID_COLUMNS[table]}, source)
+    )
+    """)
+    cur.execute(f"CREATE INDEX IF NOT EXISTS archive.idx_archive_{table}_time ON {table} ({ARCHIVE_TABLES[table]})")
+
+# kendo_bar.db -> kendo_bar_archive.db
+def archive_path_for(path):
+    return os.path.splitext(path)[0] + '_archive.db'
+
+# 아카이브 DB를 archive 로 붙이고, 라이브 + 아카이브를 합친 TEMP 뷰(<테이블>_history)를 만듦
+# 연결마다 한 번만 하면 됨 (이미 붙어 있으면 아무것도 안 함, 트랜잭션 밖에서 호출)
+def attach_archive(conn, archive_path):
+    cur = conn.cursor()
+    cur.row_factory = None
+    if any(row[1] == 'archive' for row in cur.execute("PRAGMA database_list")):
+        return
+    cur.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+    for table in ARCHIVE_TABLES:
+        create_archive_table(cur, table)
+        columns = ', '.join(live_columns(cur, table))
+        cur.execute(f"""
+        CREATE TEMP VIEW IF NOT EXISTS {table}_history AS
+        SELECT {columns} FROM main.{table} UNION ALL SELECT {columns} FROM archive.{table}
+        """)
+    conn.commit()
+
+# 예전 아카이브(라이브와 같은 스키마, source 없음)를 새 스키마로 옮기고,
+# 라이브 DB의 AUTOINCREMENT 를 아카이브의 id 뒤로 밀어서 _history 뷰에서 id 가 겹치지 않게 함
+# 어느 DB에서 왔는지 모르는 예전 행은 source = 'legacy'
+def migrate_archive(conn, archive_path):
+    if not os.path.exists(archive_path):
+        return
+    cur = conn.cursor()
+    cur.row_factory = None
+    cur.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        for table, id_column in ARCHIVE_ID_COLUMNS.items():
+            old_columns = [row[1] for row in cur.execute(f"PRAGMA archive.table_info({table})")]
+            if old_columns and 'source' not in old_columns:
+                cur.execute(f"DROP INDEX IF EXISTS archive.idx_archive_{table}_time")
+                cur.execute(f"ALTER TABLE archive.{table} RENAME TO {table}_legacy")
+                create_archive_table(cur, table)
+                columns = ', '.join(name for name in live_columns(cur, table) if name in old_columns)
+                cur.execute(f"""
+                INSERT INTO archive.{table} (source, {columns})
+                SELECT 'legacy', {columns} FROM archive.{table}_legacy ORDER BY {id_column}
+                """)
+                cur.execute(f"DROP TABLE archive.{table}_legacy")
+                print(f"Migrated archive.{table} to archive_id / source")
+            if old_columns:
+                last_id = cur.execute(f"SELECT MAX({id_column}) FROM archive.{table}").fetchone()[0]
+                if last_id is not None:
+                    cur.execute("UPDATE main.sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (last_id, table))
+                    cur.execute("""
+                    INSERT INTO main.sqlite_sequence (name, seq)
+                    SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM main.sqlite_sequence WHERE name = ?)
+                    """, (table, last_id, table))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.execute("DETACH DATABASE archive")
+
+# 일자 마감: before(YYYY-MM-DD, 기본은 오늘) 이전 기록을 아카이브 DB로 옮기고 매출 집계를 다시 계산
+# 라이브 DB에는 오늘 영업분만 남아서 조회 / 집계가 가벼워짐
+def rollover_database(path=None, before=None, archive_path=None):
+    path = path or db_path
+    before = before or datetime.now().strftime('%Y-%m-%d')
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout = 30000")
+    archive_path = archive_path or archive_path_for(path)
+    cur = conn.cursor()
+    create_db_meta(cur)
+    migrate_archive(conn, archive_path)
+    attach_archive(conn, archive_path)
+    source = database_id(cur)
+
+    # WAL 모드에서는 붙인 DB 두 개에 걸친 트랜잭션이 원자적이지 않으므로 두 번에 나눠 커밋:
+    # 1) 아카이브로 복사 (아카이브 파일만 씀, 다시 실행해도 되도록 (id, source) 기준 INSERT OR IGNORE)
+    # 2) 이 DB(source)에서 복사된 것이 확인된 행만 (id, 시각) 으로 맞춰서 라이브 DB에서 지우고
+    #    매출 집계 재계산 (라이브 파일만 씀)
+    # 사이에서 끊기면 같은 행이 양쪽에 남을 뿐이고, 다시 실행하면 마저 지워짐
+    moved = {}
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            for table, time_column in ARCHIVE_TABLES.items():
+                columns = ', '.join(live_columns(cur, table))
+                cur.execute(f"""
+                INSERT OR IGNORE INTO archive.{table} (source, {columns})
+                SELECT ?, {columns} FROM main.{table} WHERE {time_column} < ?
+                """, (source, before))
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            for table, time_column in ARCHIVE_TABLES.items():
+                id_column = ARCHIVE_ID_COLUMNS[table]
+                cur.execute(f"""
+                DELETE FROM main.{table}
+                WHERE {time_column} < ? AND ({id_column}, {time_column}) IN (
+                    SELECT {id_column}, {time_column} FROM archive.{table} WHERE source = ? AND {time_column} < ?
+                )
+                """, (before, source, before))
+                moved[table] = cur.rowcount
+                left = cur.execute(f"SELECT COUNT(*) FROM main.{table} WHERE {time_column} < ?", (before,)).fetchone()[0]
+                if left:
+                    print(f"Warning: {left} rows in {table} were not archived and stay in the live database")
+            rebuild_sales_summary(cur)
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return moved
+
+# 작은 테이블은 전체 스캔해도 괜찮음 (테이블 18개, 메뉴 20여 개, 집계 테이블은 메뉴/시간대 수만큼)
+SCAN_ALLOWED_TABLES = {'table_orders', 'menu_items', 'sales_summary', 'sales_by_menu', 'sales_by_hour'}
+
+# app.py 안의 SQL 문자열을 모두 찾아서 반환 (f-string 의 {...} 부분은 ? 로 치환)
+def collect_app_queries(app_path):
+    with open(app_path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+
+    queries = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.JoinedStr):
+            sql = ''.join(
+                value.value if isinstance(value, ast.Constant) else '?'
+                for value in node.values
+            )
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            sql = node.value
+        else:
+            continue
+        sql = ' '.join(sql.split())
+        if sql.split(' ', 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE'):
+            queries.append((node.lineno, sql))
+    # f-string 안의 상수 조각이 따로 잡히지 않도록 줄 번호 기준으로 중복 제거
+    unique = {}
+    for lineno, sql in queries:
+        if lineno not in unique or len(sql) > len(unique[lineno]):
+            unique[lineno] = sql
+    return sorted(unique.items())
+
+# app.py 쿼리마다 EXPLAIN QUERY PLAN 출력, WHERE/ORDER BY 가 있는데 테이블 스캔이면 실패
+def explain_queries(app_path=None):
+    app_path = app_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'explain.db')
+        create_tables(path)
+        conn = sqlite3.connect(path)
+        attach_archive(conn, os.path.join(workdir, 'explain_archive.db'))
+
+        regressions = []
+        for lineno, sql in collect_app_queries(app_path):
+            params = [None] * sql.count('?')
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            print(f"app.py:{lineno}: {sql}")
+            filtered = ' WHERE ' in sql.upper()
+            tables = set()
+            found = []
+            for row in plan:
+                detail = row[-1]
+                print(f"    {detail}")
+                if detail.startswith(('SCAN ', 'SEARCH ')):
+                    tables.add(detail.split()[1])
+                scanned = (
+                    (detail.startswith('SCAN ') and ' INDEX ' not in detail)
+                    or (detail.startswith('SEARCH ') and ' USING ' not in detail)
+                )
+                if (filtered and scanned) or 'USE TEMP B-TREE' in detail:
+                    found.append((lineno, detail))
+            # 작은 테이블만 읽는 쿼리는 스캔/정렬해도 통과
+            if not tables <= SCAN_ALLOWED_TABLES:
+                regressions.extend(found)
+        conn.close()
+
+    if regressions:
+        print("\nFull scans found:")
+        for lineno, detail in regressions:
+            print(f"    app.py:{lineno}: {detail}")
+    return not regressions
+
 if __name__ == "__main__":
-    initialize_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--migrate', action='store_true', help='데이터를 지우지 않고 스키마만 업데이트')
+    parser.add_argument('--explain', action='store_true', help='app.py 쿼리의 실행 계획 확인')
+    parser.add_argument('--rollover', action='store_true', help='지난 기록을 아카이브 DB로 옮김 (일자 마감)')
+    parser.add_argument('--before', help='--rollover 기준 날짜 YYYY-MM-DD (기본: 오늘)')
+    args = parser.parse_args()
+
+    if args.explain:
+        sys.exit(0 if explain_queries() else 1)
+    elif args.rollover:
+        moved = rollover_database(before=args.before)
+        for table, count in moved.items():
+            print(f"{table}: {count} rows -> {archive_path_for(db_path)}")
+    elif args.migrate:
+        migrate_database()
+        print(f"Database '{db_path}' has been migrated successfully!")
+    else:
+        initialize_database()
\ No newline at end of file
@@ -0,0 +1,121 @@
+# 매장 테이블 현황 (메모리)
+# 테이블 18개의 금액 / 주문 수량 / 메모 / 입장 시각을 메모리에 들고 있고,
+# 메인 / 테이블 화면은 DB를 읽지 않고 여기서 바로 그린다.
+# 쓰기 라우트는 SQLite 트랜잭션 안에서 read_table() 로 바뀐 행을 읽고, 커밋한 다음 put() 으로 반영.
+# 커밋이 끝난 요청 스레드들이 깨어나는 순서는 커밋 순서와 다를 수 있으므로, table_orders.version
+# (같은 트랜잭션에서 트리거가 올림) 이 지금 것보다 큰 기록만 받아들인다.
+# 다른 프로세스가 쓴 변경은 refresh() 가 version 을 비교해서 바뀐 테이블만 다시 읽음.
+
+import threading
+from datetime import datetime
+
+class TableRecord:
+    __slots__ = ('table_num', 'total_price', 'entrance_time', 'entrance_epoch', 'memo', 'items', 'version')
+
+    def __init__(self, table_num, total_price, entrance_time, memo, items, version):
+        self.table_num = table_num
+        self.total_price = total_price
+        self.entrance_time = entrance_time if entrance_time and entrance_time != "0" else ""
+        self.entrance_epoch = parse_epoch(self.entrance_time)  # 화면에서 경과 시간 계산용
+        self.memo = memo or ""
+        self.items = items  # {메뉴 이름: 수량}
+        self.version = version
+
+    def elapsed_seconds(self, now):
+        return max(0, int(now - self.entrance_epoch)) if self.entrance_epoch else 0
+
+    def to_dict(self):
+        return {
+            'table_num': self.table_num,
+            'total_price': self.total_price,
+            'items': self.items,
+        }
+
+def parse_epoch(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').timestamp()
+    except ValueError:
+        return None
+
+# 테이블 하나를 DB에서 읽음 (쓰기 트랜잭션 안에서 호출하면 커밋될 내용과 같음)
+def read_table(cursor, table_num):
+    cursor.execute("""
+    SELECT table_num, total_price, entrance_time, memo, version
+    FROM table_orders WHERE table_num = ?
+    """, (table_num,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    cursor.execute("""
+    SELECT name AS menu_name, qty FROM table_items CROSS JOIN menu_items USING (menu_id)
+    WHERE table_num = ?
+    """, (table_num,))
+    items = {item['menu_name']: item['qty'] for item in cursor.fetchall()}
+    return TableRecord(row['table_num'], row['total_price'], row['entrance_time'], row['memo'], items, row['version'])
+
+class FloorState:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {}
+        self.loaded = False
+
+    def load(self, cursor):
+        cursor.execute("SELECT table_num, total_price, entrance_time, memo, version FROM table_orders")
+        rows = cursor.fetchall()
+        cursor.execute("SELECT table_num, name AS menu_name, qty FROM table_items CROSS JOIN menu_items USING (menu_id)")
+        items = {}
+        for item in cursor.fetchall():
+            items.setdefault(item['table_num'], {})[item['menu_name']] = item['qty']
+        tables = {
+            row['table_num']: TableRecord(row['table_num'], row['total_price'], row['entrance_time'],
+                                          row['memo'], items.get(row['table_num'], {}), row['version'])
+            for row in rows
+        }
+        with self._lock:
+            self._tables = tables
+            self.loaded = True
+
+    def reset(self):
+        with self._lock:
+            self._tables = {}
+            self.loaded = False
+
+    def get(self, table_num):
+        return self._tables.get(table_num)
+
+    # 테이블 번호 순서대로
+    def tables(self):
+        tables = self._tables
+        return [tables[table_num] for table_num in sorted(tables)]
+
+    # 테이블 version 합계: 어느 테이블이든 바뀌면 커지고, 같은 DB를 보는 프로세스끼리는 같은 값
+    def version(self):
+        return sum(record.version for record in self._tables.values())
+
+    # 커밋한 다음 호출 (record 는 read_table() 결과). 이미 더 새 버전이 들어와 있으면 무시
+    def put(self, record):
+        if record is not None:
+            with self._lock:
+                current = self._tables.get(record.table_num)
+                if current is None or record.version > current.version:
+                    self._tables[record.table_num] = record
+
+    # 다른 프로세스가 바꾼 테이블만 DB에서 다시 읽음 (테이블 18개의 version 만 비교)
+    # version 과 테이블 내용이 같은 시점이 되도록 읽기 트랜잭션 하나로 읽음
+    def refresh(self, cursor):
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute("SELECT table_num, version FROM table_orders")
+            tables = self._tables
+            stale = [
+                row['table_num'] for row in cursor.fetchall()
+                if row['table_num'] not in tables or tables[row['table_num']].version != row['version']
+            ]
+            records = [read_table(cursor, table_num) for table_num in stale]
+        finally:
+            cursor.execute("COMMIT")
+        for record in records:
+            self.put(record)
+        return len(records)
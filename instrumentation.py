@@ -0,0 +1,274 @@
+# 라우트별 지연 시간 / SQL 실행 기록과 엔드포인트 단위 프로파일링
+#
+# - before_request / teardown_request 로 요청마다 지연 시간, SQL 문 수, JSON 변환 시간을 기록
+# - InstrumentedConnection 으로 만든 SQLite 연결은 실행한 SQL 문과 걸린 시간을 현재 요청에 남김
+#   (쓰기 스레드처럼 요청 밖에서 실행하는 코드는 collect_statements() 로 모아서 add_statements() 로 요청에 붙임)
+# - enable_profiling(endpoint) 로 특정 엔드포인트의 다음 요청들을 cProfile(또는 pyinstrument)로 측정
+
+import cProfile
+import heapq
+import io
+import itertools
+import pstats
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import LatencyHistogram
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+# 요청 지연 시간 히스토그램 구간 (ms)
+REQUEST_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_collector = threading.local()
+
+# 현재 요청에 SQL 실행 기록 추가 (collect_statements() 안이면 그 목록에, 요청 밖에서 쓰는 연결은 기록하지 않음)
+def record_statement(sql, seconds):
+    statements = getattr(_collector, 'statements', None)
+    if statements is not None:
+        statements.append((seconds, sql))
+    elif has_request_context():
+        trace = g.get('_trace')
+        if trace is not None:
+            trace.statements.append((seconds, sql))
+
+# 이 스레드에서 실행하는 SQL 을 statements 목록에 모음 (다른 스레드가 요청 대신 실행할 때)
+@contextmanager
+def collect_statements(statements):
+    _collector.statements = statements
+    try:
+        yield statements
+    finally:
+        _collector.statements = None
+
+# collect_statements() 로 모은 기록을 현재 요청에 추가
+def add_statements(statements):
+    if has_request_context():
+        trace = g.get('_trace')
+        if trace is not None:
+            trace.statements.extend(statements)
+
+def record_json(seconds):
+    if has_request_context():
+        trace = g.get('_trace')
+        if trace is not None:
+            trace.json_seconds += seconds
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_statement(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_statement(sql, time.perf_counter() - started)
+
+# sqlite3.connect(..., factory=InstrumentedConnection) 으로 사용
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# request.json 파싱과 jsonify 직렬화 시간 기록
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            record_json(time.perf_counter() - started)
+
+    def loads(self, s, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().loads(s, **kwargs)
+        finally:
+            record_json(time.perf_counter() - started)
+
+class RequestTrace:
+    __slots__ = ('started', 'statements', 'json_seconds', 'profiler')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = []
+        self.json_seconds = 0.0
+        self.profiler = None
+
+class RouteStats:
+    def __init__(self):
+        self.latency = LatencyHistogram(REQUEST_BUCKETS_MS)
+        self.statements = 0
+        self.max_statements = 0
+        self.sql_ms = 0.0
+        self.json_ms = 0.0
+        self.errors = 0
+
+class Instrumentation:
+    def __init__(self, app=None, slow_statements=20, profiles=10):
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()  # 프로파일러는 한 번에 하나만
+        self._counter = itertools.count()
+        self.slow_statement_count = slow_statements
+        self.routes = defaultdict(RouteStats)
+        self.slow_statements = []  # (ms, 순번, 상세) 최소 힙, 가장 느린 N개 유지
+        self.profiles = deque(maxlen=profiles)
+        self.profile_endpoint = None
+        self.profile_remaining = 0
+        self.profile_every = 1
+        self.profile_mode = 'cprofile'
+        self._profile_seen = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+
+    # endpoint 의 다음 요청들 중 every 번째마다 count 번 프로파일링
+    def enable_profiling(self, endpoint, count=1, every=1, mode='cprofile'):
+        if mode == 'pyinstrument' and pyinstrument is None:
+            raise ValueError('pyinstrument is not installed')
+        with self._lock:
+            self.profile_endpoint = endpoint
+            self.profile_remaining = count
+            self.profile_every = max(1, every)
+            self.profile_mode = mode
+            self._profile_seen = 0
+
+    def disable_profiling(self):
+        with self._lock:
+            self.profile_endpoint = None
+            self.profile_remaining = 0
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+            self.slow_statements.clear()
+
+    def _should_profile(self, endpoint):
+        with self._lock:
+            if endpoint != self.profile_endpoint or self.profile_remaining <= 0:
+                return False
+            self._profile_seen += 1
+            if (self._profile_seen - 1) % self.profile_every:
+                return False
+            self.profile_remaining -= 1
+            return True
+
+    def _start_request(self):
+        trace = g._trace = RequestTrace()
+        if self._should_profile(request.endpoint) and self._profile_lock.acquire(blocking=False):
+            if self.profile_mode == 'pyinstrument':
+                trace.profiler = pyinstrument.Profiler()
+                trace.profiler.start()
+            else:
+                trace.profiler = cProfile.Profile()
+                trace.profiler.enable()
+
+    def _finish_request(self, exception):
+        trace = g.pop('_trace', None)
+        if trace is None:
+            return
+        elapsed_ms = (time.perf_counter() - trace.started) * 1000
+        endpoint = request.endpoint or request.path
+
+        if trace.profiler is not None:
+            self._store_profile(trace.profiler, endpoint, elapsed_ms)
+
+        sql_ms = sum(seconds for seconds, sql in trace.statements) * 1000
+        with self._lock:
+            stats = self.routes[endpoint]
+            stats.latency.observe(elapsed_ms)
+            stats.statements += len(trace.statements)
+            stats.max_statements = max(stats.max_statements, len(trace.statements))
+            stats.sql_ms += sql_ms
+            stats.json_ms += trace.json_seconds * 1000
+            if exception is not None:
+                stats.errors += 1
+
+            for seconds, sql in trace.statements:
+                entry = (seconds * 1000, next(self._counter), {
+                    'ms': seconds * 1000,
+                    'sql': ' '.join(sql.split()),
+                    'endpoint': endpoint,
+                    'path': request.full_path.rstrip('?'),
+                    'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                })
+                if len(self.slow_statements) < self.slow_statement_count:
+                    heapq.heappush(self.slow_statements, entry)
+                elif entry[0] > self.slow_statements[0][0]:
+                    heapq.heapreplace(self.slow_statements, entry)
+
+    def _store_profile(self, profiler, endpoint, elapsed_ms):
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+                output = io.StringIO()
+                pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(30)
+                report = output.getvalue()
+            else:
+                profiler.stop()
+                report = profiler.output_text(unicode=True)
+        finally:
+            self._profile_lock.release()
+        with self._lock:
+            self.profiles.appendleft({
+                'endpoint': endpoint,
+                'path': request.full_path.rstrip('?'),
+                'ms': elapsed_ms,
+                'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'report': report,
+            })
+
+    # 관리자 페이지용 요약
+    def snapshot(self):
+        with self._lock:
+            routes = []
+            for endpoint, stats in sorted(self.routes.items(), key=lambda item: -item[1].latency.sum):
+                count = stats.latency.count
+                routes.append({
+                    'endpoint': endpoint,
+                    'count': count,
+                    'errors': stats.errors,
+                    'p50': stats.latency.quantile(0.50),
+                    'p95': stats.latency.quantile(0.95),
+                    'p99': stats.latency.quantile(0.99),
+                    'max': stats.latency.max,
+                    'avg_statements': stats.statements / count if count else 0,
+                    'max_statements': stats.max_statements,
+                    'avg_sql_ms': stats.sql_ms / count if count else 0,
+                    'avg_json_ms': stats.json_ms / count if count else 0,
+                })
+            return {
+                'routes': routes,
+                'slow_statements': [entry[2] for entry in sorted(self.slow_statements, reverse=True)],
+                'profiles': list(self.profiles),
+                'profiling': {
+                    'endpoint': self.profile_endpoint,
+                    'remaining': self.profile_remaining,
+                    'every': self.profile_every,
+                    'mode': self.profile_mode,
+                },
+                'pyinstrument': pyinstrument is not None,
+            }
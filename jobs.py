@@ -0,0 +1,140 @@
+# 백그라운드 작업 (엑셀 내보내기 / 보고서)
+#
+# 요청 스레드는 submit() 으로 작업을 맡기고 job id 만 돌려받는다. 작업 스레드 풀이 파일을 만들고,
+# 클라이언트는 상태를 확인하다가 끝나면 내려받는다.
+# 같은 key(보고서 종류 + 조건 + 데이터 버전)로 다시 요청하면 이미 만든(또는 만드는 중인) 작업을 그대로 돌려준다.
+#
+# serve.py(eventlet / gevent)는 threading 을 green thread 로 바꿔 놓으므로 작업 스레드 풀도 green thread 가 된다.
+# sqlite3 / openpyxl 은 허브에 양보하지 않아서 그대로 돌리면 파일을 만드는 동안 모든 요청이 멈추므로,
+# 실제 작업(build)은 run_native() 로 진짜 OS 스레드에서 돌린다.
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# fn(*args, **kwargs) 를 OS 스레드에서 실행하고 결과를 돌려줌 (예외도 그대로 전달)
+# eventlet / gevent 로 monkey patch 된 프로세스면 그 라이브러리의 스레드 풀에 맡기고 호출한 green thread 만 기다림
+# 아니면 (python app.py, 테스트) 이미 OS 스레드이므로 그냥 호출
+def run_native(fn, *args, **kwargs):
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher, tpool
+        if patcher.is_monkey_patched('thread'):
+            return tpool.execute(fn, *args, **kwargs)
+    if 'gevent' in sys.modules:
+        from gevent import get_hub, monkey
+        if monkey.is_module_patched('threading'):
+            return get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
+
+class Job:
+    def __init__(self, key, kind, filename, mimetype):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.kind = kind
+        self.filename = filename    # 내려받을 때 파일 이름
+        self.mimetype = mimetype
+        self.status = 'queued'      # queued / running / done / failed
+        self.path = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'filename': self.filename,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'seconds': round(self.finished - self.started, 3) if self.finished and self.started else None,
+        }
+
+class JobRunner:
+    # workers: 동시에 만들 파일 수 (주문 처리와 CPU를 나눠 쓰므로 기본 1)
+    # max_jobs: 보관할 작업 수, 넘치면 끝난 작업부터 파일과 함께 지움
+    def __init__(self, workers=1, max_jobs=20, directory=None):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.directory = directory
+        self._executor = None
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # id → Job (오래된 순)
+        self._by_key = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _start(self):
+        if self._executor is None:
+            self.directory = self.directory or tempfile.mkdtemp(prefix='kendo-jobs-')
+            os.makedirs(self.directory, exist_ok=True)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        return self._executor
+
+    # build(path) 가 path 에 파일을 만듦. 반환: (Job, 캐시에서 찾았는지)
+    def submit(self, key, kind, filename, mimetype, build):
+        with self._lock:
+            job = self._by_key.get(key)
+            if job is not None and job.status != 'failed':
+                self.hits += 1
+                return job, True
+            self.misses += 1
+            executor = self._start()
+            job = Job(key, kind, filename, mimetype)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self._evict()
+        executor.submit(self._run, job, build)
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict(self):
+        finished = [job for job in self._jobs.values() if job.status in ('done', 'failed')]
+        for job in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+            if job.path:
+                try:
+                    os.remove(job.path)
+                except OSError:
+                    pass
+
+    def _run(self, job, build):
+        job.status = 'running'
+        job.started = time.time()
+        path = os.path.join(self.directory, f"{job.id}-{job.filename}")
+        try:
+            run_native(build, path)
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            job.path = path
+            job.status = 'done'
+        job.finished = time.time()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._jobs.clear()
+            self._by_key.clear()
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if self.directory and os.path.isdir(self.directory):
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
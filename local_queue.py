@@ -0,0 +1,63 @@
+# SocketIO 메시지 큐의 로컬 대체품: Redis 없이 같은 기계의 여러 워커 프로세스가
+# SQLite 파일 하나를 통해 방송(emit)을 주고받는다. 테스트 / 단일 서버 운영용.
+#
+#   KENDO_SOCKETIO_MESSAGE_QUEUE=sqlite:///socketio_queue.db
+import json
+import sqlite3
+import time
+
+import socketio
+
+class SQLiteQueueManager(socketio.PubSubManager):
+    name = 'sqlite'
+
+    def __init__(self, path, channel='flask-socketio', write_only=False, logger=None,
+                 poll_interval=0.05, keep_seconds=60):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.keep_seconds = keep_seconds  # 이보다 오래된 메시지는 지움
+        self._publish_conn = None
+        self._published = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS socketio_messages (
+                message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                created REAL NOT NULL,
+                payload TEXT NOT NULL
+            )
+        """)
+        return conn
+
+    def _publish(self, data):
+        if self._publish_conn is None:
+            self._publish_conn = self._connect()
+        now = time.time()
+        self._publish_conn.execute(
+            "INSERT INTO socketio_messages (channel, created, payload) VALUES (?, ?, ?)",
+            (self.channel, now, json.dumps(data, ensure_ascii=False))
+        )
+        self._published += 1
+        if self._published % 100 == 0:
+            self._publish_conn.execute(
+                "DELETE FROM socketio_messages WHERE created < ?", (now - self.keep_seconds,)
+            )
+
+    # 마지막으로 읽은 message_id 이후의 메시지를 주기적으로 읽어서 넘겨줌
+    def _listen(self):
+        conn = self._connect()
+        last_id = conn.execute("SELECT COALESCE(MAX(message_id), 0) FROM socketio_messages").fetchone()[0]
+        while True:
+            rows = conn.execute(
+                "SELECT message_id, payload FROM socketio_messages WHERE message_id > ? AND channel = ? ORDER BY message_id",
+                (last_id, self.channel)
+            ).fetchall()
+            for message_id, payload in rows:
+                last_id = message_id
+                yield payload
+            self.server.sleep(self.poll_interval)
@@ -0,0 +1,189 @@
+# 주방 처리량 지표
+# 주문 / 완료 / 취소가 일어날 때마다 누적만 하고, DB를 다시 스캔하지 않는다.
+
+import threading
+import time
+from collections import defaultdict
+
+# 주문 → 완료 지연 시간 히스토그램 구간 (초)
+LATENCY_BUCKETS = (30, 60, 120, 180, 300, 420, 600, 900, 1200, 1800, 2700, 3600)
+
+# 분당 완료 수 계산에 쓰는 구간 (분)
+THROUGHPUT_WINDOW_MINUTES = 5
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막 칸은 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    # 구간 안에서 선형 보간한 분위수 (Prometheus histogram_quantile 과 같은 방식)
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if count and seen + count >= rank:
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+            lower = upper
+        return self.max
+
+class KitchenMetrics:
+    # menu_to_category: 메뉴 이름 → 스테이션(카테고리) 이름
+    def __init__(self, menu_to_category=None):
+        self.menu_to_category = menu_to_category or {}
+        self._lock = threading.Lock()
+        self.seeded = False
+        self.menu_latency = defaultdict(LatencyHistogram)
+        self.station_latency = defaultdict(LatencyHistogram)
+        self.queue_depth = defaultdict(int)
+        self.ordered = defaultdict(int)
+        self.completed = defaultdict(int)
+        self.cancelled = defaultdict(int)
+        self._completed_by_minute = defaultdict(int)  # (스테이션, 분) → 완료 수
+
+    def _station(self, menu_name):
+        return self.menu_to_category.get(menu_name, '기타')
+
+    # 메뉴 목록을 다시 읽을 때 호출. 스테이션이 바뀐 메뉴가 있으면 큐 길이를 비우고 다시 seed 받음
+    def set_stations(self, menu_to_category):
+        with self._lock:
+            if menu_to_category == self.menu_to_category:
+                return
+            if self.seeded:
+                self.queue_depth.clear()
+                self.seeded = False
+            self.menu_to_category = menu_to_category
+
+    # 시작할 때 한 번, 현재 대기 중인 주문 수로 큐 길이를 맞춤
+    # queue_counts: 메뉴 이름 → 대기 주문 수
+    def seed(self, queue_counts):
+        with self._lock:
+            if self.seeded:
+                return
+            for menu_name, count in queue_counts.items():
+                self.queue_depth[self._station(menu_name)] += count
+            self.seeded = True
+
+    def record_orders(self, menu_names):
+        with self._lock:
+            for menu_name in menu_names:
+                station = self._station(menu_name)
+                self.ordered[station] += 1
+                self.queue_depth[station] += 1
+
+    def record_completion(self, menu_name, latency_seconds, now=None):
+        minute = int((now or time.time()) // 60)
+        with self._lock:
+            station = self._station(menu_name)
+            self.menu_latency[menu_name].observe(latency_seconds)
+            self.station_latency[station].observe(latency_seconds)
+            self.completed[station] += 1
+            self.queue_depth[station] = max(0, self.queue_depth[station] - 1)
+            self._completed_by_minute[(station, minute)] += 1
+            # 오래된 분 단위 기록 정리
+            for key in [key for key in self._completed_by_minute if key[1] < minute - THROUGHPUT_WINDOW_MINUTES]:
+                del self._completed_by_minute[key]
+
+    # removed_from_queue: 주방 대기열에서 실제로 빠졌는지 여부
+    def record_cancellation(self, menu_name, removed_from_queue):
+        with self._lock:
+            station = self._station(menu_name)
+            self.cancelled[station] += 1
+            if removed_from_queue:
+                self.queue_depth[station] = max(0, self.queue_depth[station] - 1)
+
+    # 최근 THROUGHPUT_WINDOW_MINUTES 분 동안의 분당 완료 수
+    def _per_minute(self, station, now):
+        minute = int(now // 60)
+        total = sum(
+            count for (name, at), count in self._completed_by_minute.items()
+            if name == station and at > minute - THROUGHPUT_WINDOW_MINUTES
+        )
+        return total / THROUGHPUT_WINDOW_MINUTES
+
+    # 대시보드용 요약
+    def snapshot(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            stations = sorted(set(self.queue_depth) | set(self.ordered) | set(self.completed) | set(self.cancelled))
+            return {
+                'stations': [
+                    {
+                        'name': station,
+                        'queue_depth': self.queue_depth[station],
+                        'ordered': self.ordered[station],
+                        'completed': self.completed[station],
+                        'cancelled': self.cancelled[station],
+                        'cancel_rate': self.cancelled[station] / self.ordered[station] if self.ordered[station] else 0.0,
+                        'per_minute': self._per_minute(station, now),
+                        'p50': self.station_latency[station].quantile(0.50),
+                        'p95': self.station_latency[station].quantile(0.95),
+                        'p99': self.station_latency[station].quantile(0.99),
+                    }
+                    for station in stations
+                ],
+                'menus': [
+                    {
+                        'name': menu_name,
+                        'station': self._station(menu_name),
+                        'completed': histogram.count,
+                        'p50': histogram.quantile(0.50),
+                        'p95': histogram.quantile(0.95),
+                        'p99': histogram.quantile(0.99),
+                    }
+                    for menu_name, histogram in sorted(self.menu_latency.items())
+                ],
+            }
+
+    # Prometheus 텍스트 형식
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            for name, label, histograms, help_text in (
+                ('kitchen_menu_latency_seconds', 'menu', self.menu_latency, 'Order-to-done latency per menu.'),
+                ('kitchen_station_latency_seconds', 'station', self.station_latency, 'Order-to-done latency per station.'),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(histograms.items()):
+                    labels = f'{label}="{escape_label(key)}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+            for name, kind, values, help_text in (
+                ('kitchen_queue_depth', 'gauge', self.queue_depth, 'Pending orders per station.'),
+                ('kitchen_orders_total', 'counter', self.ordered, 'Orders sent to each station.'),
+                ('kitchen_orders_completed_total', 'counter', self.completed, 'Orders completed per station.'),
+                ('kitchen_orders_cancelled_total', 'counter', self.cancelled, 'Orders cancelled per station.'),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for station, value in sorted(values.items()):
+                    lines.append(f'{name}{{station="{escape_label(station)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,52 @@
+# 운영용 실행: python serve.py
+#
+# 설정은 모두 KENDO_ 로 시작하는 환경 변수로 (app.py 의 기본값을 덮어씀)
+#   KENDO_HOST, KENDO_PORT, KENDO_DB_PATH, KENDO_SECRET_KEY
+#   KENDO_SOCKETIO_ASYNC_MODE      eventlet / gevent (비우면 설치된 것 중 자동 선택)
+#   KENDO_SOCKETIO_MESSAGE_QUEUE   redis://... 또는 sqlite:///socketio_queue.db (로컬 대체 큐)
+#
+# 디버그 서버와 달리 리로더 / 디버거 없이 비동기 워커로 요청을 동시에 처리하므로
+# 엑셀 내보내기 같은 느린 요청이 다른 단말기를 막지 않는다.
+# eventlet 또는 gevent 가 필요하다 (pip install eventlet). 둘 다 없으면 Werkzeug 개발 서버로 대신 띄우지 않고 종료.
+#
+# 여러 프로세스로 띄울 때는 메시지 큐를 설정해야 다른 워커에 붙은 주방 화면에도 방송이 간다.
+#   KENDO_SOCKETIO_MESSAGE_QUEUE=sqlite:///socketio_queue.db KENDO_FLOOR_REFRESH=true KENDO_HTTP_ETAGS=false \
+#   gunicorn -k eventlet -w 1 -b 0.0.0.0:5021 serve:app
+# (워커마다 gunicorn 을 포트를 달리해서 따로 띄우고 앞단에서 sticky session 으로 묶음)
+# 주문 / 취소 / 결제는 어느 워커로 가도 된다: 쓰기는 SQLite 가 순서를 정하고, FLOOR_REFRESH 이면 메인 / 테이블 화면이
+# 그리기 전에 table_orders.version 을 확인해서 다른 워커가 바꾼 테이블을 다시 읽는다 (메인 화면 ETag 에는 그 version 이 들어가지만, 결제 / 완료 목록 등의 ETag 버전은 프로세스마다 따로라 끔).
+# 프로세스마다 따로인 것: 주방 지표(/metrics 는 그 워커가 받은 주문만 셈), 메뉴 캐시(/menu/reload 는 워커마다 보내야 함),
+# 내보내기 작업 목록(/jobs/<id> 는 만든 워커에서만 조회되므로 sticky session 필요)
+import importlib.util
+import os
+import sys
+
+async_mode = os.environ.get('KENDO_SOCKETIO_ASYNC_MODE', '').strip('"')
+if not async_mode:
+    async_mode = next((name for name in ('eventlet', 'gevent') if importlib.util.find_spec(name)), '')
+    if async_mode:
+        os.environ['KENDO_SOCKETIO_ASYNC_MODE'] = async_mode  # app.py 의 SocketIO 도 같은 모드로
+if async_mode == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif async_mode == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+from app import app, socketio, startup
+
+if __name__ == '__main__' and socketio.async_mode not in ('eventlet', 'gevent'):
+    sys.exit(f"serve.py 는 eventlet 또는 gevent 가 필요합니다 (현재: {socketio.async_mode}). "
+             "pip install eventlet 후 다시 실행하세요. 개발용으로는 python app.py")
+
+startup()
+
+if __name__ == '__main__':
+    socketio.run(
+        app,
+        host=app.config['HOST'],
+        port=app.config['PORT'],
+        debug=False,
+        use_reloader=False,
+        log_output=True,
+    )
@@ -0,0 +1,188 @@
+# 주방 티켓 프린터 스풀러
+#
+# 주문 라우트는 submit() 으로 티켓(스테이션, 테이블, 메뉴 목록)을 큐에 넣고 바로 돌아간다.
+# 프린터(장치 경로)마다 큐 하나와 작업 스레드 하나가 있어서, 스레드가 ESC/POS 바이트를 만들어 장치에 쓴다.
+# 프린터 하나가 멈춰도 다른 스테이션 출력이나 주문 요청은 기다리지 않는다.
+#
+# 장치 경로는 실제 프린터(/dev/usb/lp0 등) 대신 일반 파일이나 FIFO 를 써도 된다.
+#   mkfifo /tmp/takoyaki && cat /tmp/takoyaki | hexdump -C
+
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from metrics import LatencyHistogram, escape_label
+
+# 큐에 넣은 시각부터 장치에 다 쓸 때까지 걸린 시간 구간 (초)
+PRINT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+# ESC/POS 명령
+ESC_INIT = b'\x1b@'
+ESC_ALIGN_LEFT = b'\x1ba\x00'
+ESC_ALIGN_CENTER = b'\x1ba\x01'
+GS_SIZE_NORMAL = b'\x1d!\x00'
+GS_SIZE_DOUBLE = b'\x1d!\x11'
+ESC_FEED = b'\x1bd\x04'
+GS_CUT = b'\x1dV\x42\x00'  # 조금 더 밀고 부분 절단
+
+# 한글은 국내 영수증 프린터 기본인 cp949 로 보냄
+def render_ticket(ticket, encoding='cp949'):
+    def line(text=''):
+        return text.encode(encoding, 'replace') + b'\n'
+
+    title = f"포장 {ticket['table_num']}번" if ticket.get('takeout') else f"{ticket['table_num']}번 테이블"
+    out = [ESC_INIT, ESC_ALIGN_CENTER, GS_SIZE_DOUBLE, line(ticket['station']), line(title), GS_SIZE_NORMAL,
+           line(ticket['time']), ESC_ALIGN_LEFT, line('-' * 32)]
+    for menu_name, count in ticket['items']:
+        out.append(GS_SIZE_DOUBLE + line(f"{menu_name} x{count}") + GS_SIZE_NORMAL)
+    out.append(line('-' * 32))
+    if ticket.get('memo'):
+        out.append(line(f"메모: {ticket['memo']}"))
+    out.append(line(f"주문번호 {', '.join(str(order_id) for order_id in ticket['order_ids'])}"))
+    out.extend([ESC_FEED, GS_CUT])
+    return b''.join(out)
+
+# 장치 끝에 덧붙여 씀. FIFO 를 읽는 쪽이 없으면 기다리지 않고 OSError (ENXIO) 로 실패 → 재시도
+def write_device(path, data):
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_NONBLOCK, 0o644)
+    try:
+        os.set_blocking(fd, True)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+class TicketSpooler:
+    # devices: 스테이션 이름 → 장치 경로
+    def __init__(self, devices, max_queue=200, retries=3, retry_delay=0.5, encoding='cp949'):
+        self.devices = dict(devices)
+        self.max_queue = max_queue      # 프린터마다 밀려 있을 수 있는 티켓 수, 넘치면 새 티켓은 버림
+        self.retries = retries
+        self.retry_delay = retry_delay  # 재시도 간격 (실패할 때마다 두 배)
+        self.encoding = encoding
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._threads = {}
+        self.printed = defaultdict(int)
+        self.failed = defaultdict(int)
+        self.dropped = defaultdict(int)
+        self.retried = defaultdict(int)
+        self.last_error = {}
+        self.latency = defaultdict(lambda: LatencyHistogram(PRINT_LATENCY_BUCKETS))
+
+    @property
+    def enabled(self):
+        return bool(self.devices)
+
+    def _start(self, station):
+        with self._lock:
+            if station not in self._threads:
+                self._queues[station] = queue.Queue(self.max_queue)
+                thread = threading.Thread(target=self._run, args=(station,), name=f'print-{station}', daemon=True)
+                self._threads[station] = thread
+                thread.start()
+            return self._queues[station]
+
+    # 티켓을 큐에 넣기만 하고 바로 반환 (프린터가 없는 스테이션이면 False, 큐가 꽉 차 있으면 버리고 False)
+    def submit(self, ticket):
+        station = ticket['station']
+        if station not in self.devices:
+            return False
+        try:
+            self._start(station).put_nowait((time.monotonic(), ticket))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped[station] += 1
+            return False
+
+    def stop(self):
+        with self._lock:
+            threads, self._threads = self._threads, {}
+            queues, self._queues = self._queues, {}
+        for station, thread in threads.items():
+            queues[station].put(None)
+            thread.join()
+
+    def _run(self, station):
+        jobs = self._queues[station]
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            queued_at, ticket = job
+            self._print(station, render_ticket(ticket, self.encoding), queued_at)
+
+    def _print(self, station, data, queued_at):
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                write_device(self.devices[station], data)
+            except OSError as e:
+                with self._lock:
+                    self.last_error[station] = str(e)
+                    if attempt < self.retries:
+                        self.retried[station] += 1
+                if attempt < self.retries:
+                    time.sleep(delay)
+                    delay *= 2
+                continue
+            with self._lock:
+                self.printed[station] += 1
+                self.latency[station].observe(time.monotonic() - queued_at)
+            return
+        with self._lock:
+            self.failed[station] += 1
+
+    # 대시보드용 요약
+    def snapshot(self):
+        with self._lock:
+            return [
+                {
+                    'station': station,
+                    'device': path,
+                    'queue_depth': self._queues[station].qsize() if station in self._queues else 0,
+                    'printed': self.printed[station],
+                    'retried': self.retried[station],
+                    'failed': self.failed[station],
+                    'dropped': self.dropped[station],
+                    'p50': self.latency[station].quantile(0.50),
+                    'p99': self.latency[station].quantile(0.99),
+                    'last_error': self.last_error.get(station),
+                }
+                for station, path in self.devices.items()
+            ]
+
+    # Prometheus 텍스트 형식
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            name = 'print_latency_seconds'
+            lines.append(f"# HELP {name} Ticket enqueue-to-printed latency per station.")
+            lines.append(f"# TYPE {name} histogram")
+            for station, histogram in sorted(self.latency.items()):
+                labels = f'station="{escape_label(station)}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+            depths = {station: self._queues[station].qsize() if station in self._queues else 0 for station in self.devices}
+            for name, kind, values, help_text in (
+                ('print_queue_depth', 'gauge', depths, 'Tickets waiting per printer.'),
+                ('print_tickets_total', 'counter', self.printed, 'Tickets printed per station.'),
+                ('print_retries_total', 'counter', self.retried, 'Device write retries per station.'),
+                ('print_failures_total', 'counter', self.failed, 'Tickets given up after all retries.'),
+                ('print_dropped_total', 'counter', self.dropped, 'Tickets dropped because the queue was full.'),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for station in sorted(self.devices):
+                    lines.append(f'{name}{{station="{escape_label(station)}"}} {values[station]}')
+        return '\n'.join(lines) + '\n'
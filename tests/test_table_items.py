@@ -0,0 +1,46 @@
+# /table/<n>/items 수량 검증
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench'))
+
+from common import pos, use_fresh_database
+
+@pytest.fixture
+def client(tmp_path):
+    use_fresh_database(str(tmp_path), 'test')
+    yield pos.app.test_client()
+    pos.write_journal.stop()
+    pos.db_pool.close_all()
+
+@pytest.fixture
+def menu_name(client):
+    with pos.app.app_context():
+        return pos.get_menu_catalog().menus[0]['name']
+
+def order_count(client):
+    cursor = pos.db_pool.acquire()
+    try:
+        return cursor.execute("SELECT COUNT(*) AS count FROM orders").fetchone()['count']
+    finally:
+        pos.db_pool.release(cursor)
+
+@pytest.mark.parametrize('delta', [0, pos.MAX_ITEM_DELTA + 1, -(pos.MAX_ITEM_DELTA + 1), 1000000, True, 1.5, '3'])
+def test_rejects_out_of_range_delta(client, menu_name, delta):
+    response = client.post('/table/1/items', json={'items': [{'menu_name': menu_name, 'delta': delta}]})
+    assert response.status_code == 400
+    assert order_count(client) == 0
+
+def test_rejects_split_delta_over_limit(client, menu_name):
+    items = [{'menu_name': menu_name, 'delta': pos.MAX_ITEM_DELTA}, {'menu_name': menu_name, 'delta': 1}]
+    response = client.post('/table/1/items', json={'items': items})
+    assert response.status_code == 400
+    assert order_count(client) == 0
+
+def test_accepts_delta_at_limit(client, menu_name):
+    response = client.post('/table/1/items', json={'items': [{'menu_name': menu_name, 'delta': pos.MAX_ITEM_DELTA}]})
+    assert response.status_code == 200
+    assert response.get_json()['items'][menu_name] == pos.MAX_ITEM_DELTA
+    assert order_count(client) == pos.MAX_ITEM_DELTA
@@ -0,0 +1,125 @@
+# 그룹 커밋 쓰기 큐
+#
+# 라우트는 "커서를 받아서 DB를 고치는 함수"를 submit() 으로 넘기고 결과를 기다린다.
+# 쓰기 전용 스레드 하나가 짧은 시간(window) 동안 모인 함수들을 한 트랜잭션에서 차례로 실행하고
+# 한 번만 COMMIT 한 다음 모두에게 결과를 돌려준다. 요청마다 fsync / 쓰기 잠금을 따로 잡지 않는다.
+#
+# 함수 하나가 실패하면 그 함수의 변경만 SAVEPOINT 로 되돌리고, 같은 묶음의 다른 요청은 그대로 커밋된다.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+# 커밋 내구성 -> PRAGMA synchronous
+#   full:   커밋마다 fsync, 전원이 나가도 응답한 주문은 남음
+#   normal: WAL 체크포인트 때만 fsync, 전원이 나가면 마지막 몇 묶음이 사라질 수 있음 (DB는 깨지지 않음)
+#   off:    fsync 안 함, 벤치마크 / 테스트용
+DURABILITY_LEVELS = {'full': 'FULL', 'normal': 'NORMAL', 'off': 'OFF'}
+
+class GroupCommitWriter:
+    def __init__(self, connect, window=0.005, max_batch=256, durability='normal'):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"durability must be one of {sorted(DURABILITY_LEVELS)}: {durability}")
+        self.connect = connect          # 쓰기 스레드 전용 연결을 만드는 함수
+        self.window = window            # 첫 요청이 들어온 뒤 더 모으는 시간 (초)
+        self.max_batch = max_batch
+        self.durability = durability
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # 통계 (/admin/stats 등에서 확인)
+        self.batches = 0
+        self.writes = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    # fn(cursor) 를 쓰기 스레드에서 실행하고, 커밋된 다음 그 반환값을 돌려줌 (예외도 그대로 전달)
+    # timeout 안에 쓰기 스레드가 시작하지 못했으면 취소하고 TimeoutError
+    # (큐에 남겨 두면 실패 응답 뒤에 커밋되어 재시도한 주문과 중복됨)
+    # 이미 실행을 시작했으면 취소할 수 없으므로 커밋 결과까지 기다림
+    def submit(self, fn, timeout=30):
+        self.start()
+        future = Future()
+        self._queue.put((fn, future))
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise
+            return future.result()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # 종료 신호는 이 묶음을 처리한 다음에
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        conn = self.connect()
+        conn.isolation_level = None  # BEGIN / COMMIT 을 직접 관리
+        conn.execute(f"PRAGMA synchronous = {DURABILITY_LEVELS[self.durability]}")
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                self._apply(conn, self._collect(item))
+        finally:
+            conn.close()
+
+    def _apply(self, conn, batch):
+        results = []
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue  # 기다리다 포기한 요청
+                cursor.execute("SAVEPOINT write")
+                try:
+                    results.append((future, True, fn(cursor)))
+                    cursor.execute("RELEASE write")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write")
+                    cursor.execute("RELEASE write")
+                    results.append((future, False, e))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for fn, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.writes += len(results)
+        # 커밋이 끝난 다음에 응답
+        for future, ok, value in results:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)